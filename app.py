@@ -4,6 +4,8 @@ from utils.save_docs import save_docs_to_vectordb
 from utils.session_state import initialize_session_state_variables
 from utils.prepare_vectordb import get_vectorstore
 from utils.chatbot import chat
+from utils.session_overlay import OverlayIndex, limpiar_overlay_expirado, registrar_overlay
+from utils.session_store import guardar_sesion
 # CAMBIO 1: Importamos la nueva función de scraping de becas
 from utils.web_scraper import scrape_utpl_becas 
 
@@ -48,6 +50,10 @@ class ChatApp:
         """
         upload_docs = os.listdir("docs")
 
+        # Descartar los PDFs de sesión que superaron su tiempo de vida
+        if limpiar_overlay_expirado(st):
+            st.info("Tus PDFs temporales expiraron por inactividad. Súbelos de nuevo si los necesitas.")
+
         # 📂 Sidebar — gestión de documentos y base de conocimiento
         with st.sidebar:
             st.header("Gestión de Conocimiento")
@@ -60,8 +66,6 @@ class ChatApp:
             # --- BOTÓN PARA LIMPIAR HISTORIAL ---
             if st.button("Nueva Conversación", help="Limpia el historial del chat"):
                 st.session_state.chat_history = []
-                if "retrieval_chain" in st.session_state:
-                    del st.session_state.retrieval_chain
                 st.rerun()
             
             st.divider()
@@ -73,8 +77,8 @@ class ChatApp:
             if st.button("Actualizar Becas (Web Scraping)"):
                 with st.spinner("⏳ Conectando con becas.utpl.edu.ec... esto puede tardar un poco..."):
                     scrape_utpl_becas() # Ejecuta el scraping
-                    # Forzamos la regeneración de la base vectorial
-                    st.session_state.vectordb = get_vectorstore(upload_docs, from_session_state=False)
+                    # Forzamos la regeneración de la base vectorial (queda compartida en el proceso)
+                    get_vectorstore(upload_docs, from_session_state=False)
                     st.success("¡Información de becas actualizada!")
 
             st.divider()
@@ -82,11 +86,18 @@ class ChatApp:
             # --- SECCIÓN 2: DOCUMENTOS PDF ---
             st.subheader("Tus Documentos PDF")
             if upload_docs:
-                st.write("Archivos cargados:")
+                st.write("Archivos en la base compartida:")
                 st.caption(", ".join(upload_docs))
             else:
                 st.info("No hay PDFs cargados.")
 
+            # PDFs indexados solo en esta sesión (overlay efímero)
+            overlay = st.session_state.overlay_index
+            if overlay is not None and overlay.documentos:
+                st.write("Solo en esta sesión:")
+                st.caption(", ".join(overlay.documentos) +
+                           f" (expiran en {overlay.minutos_restantes()} min sin uso)")
+
             # Subir nuevos PDFs
             pdf_docs = st.file_uploader(
                 "Sube archivos PDF extra",
@@ -94,9 +105,27 @@ class ChatApp:
                 accept_multiple_files=True
             )
 
-            # Procesar nuevos PDFs
             if pdf_docs:
-                if st.button("Procesar PDFs"):
+                # Procesar PDFs: se indexan solo en esta sesión, sin tocar la base compartida
+                if st.button("Procesar PDFs", help="Los PDFs se usan solo en tu conversación"):
+                    with st.spinner("Indexando tus PDFs..."):
+                        if overlay is None:
+                            overlay = OverlayIndex()
+                        agregados = overlay.agregar_pdfs(pdf_docs)
+                        st.session_state.overlay_index = overlay
+                        registrar_overlay(st.session_state.session_id, overlay)
+                        for nombre in agregados:
+                            if nombre not in st.session_state.uploaded_pdfs:
+                                st.session_state.uploaded_pdfs.append(nombre)
+                    if agregados:
+                        st.success(f"{len(agregados)} PDF(s) listos para consultar: " + ", ".join(agregados))
+                        st.rerun()
+                    else:
+                        st.info("ℹ Esos PDFs ya están indexados en tu sesión.")
+
+                # Publicar: operación explícita que integra los PDFs al corpus de todos
+                if st.button("Publicar en la base compartida",
+                             help="Guarda los PDFs en docs/ y regenera la base para todos los usuarios"):
                     # Guardar archivos en carpeta docs
                     files_saved = save_docs_to_vectordb(pdf_docs, upload_docs)
                     
@@ -106,10 +135,10 @@ class ChatApp:
                         
                         # Regenerar base vectorial con TODOS los PDFs
                         with st.spinner("Actualizando base de conocimiento..."):
-                            st.session_state.vectordb = get_vectorstore(upload_docs, from_session_state=False)
-                            # Forzar recreación del chain para usar la nueva base vectorial
-                            if "retrieval_chain" in st.session_state:
-                                del st.session_state.retrieval_chain
+                            get_vectorstore(upload_docs, from_session_state=False)
+                            # Los PDFs publicados ya no necesitan el overlay de la sesión
+                            if overlay is not None:
+                                overlay.quitar_pdfs(pdf.name for pdf in pdf_docs)
                             st.session_state.previous_upload_docs_length = len(upload_docs)
                             st.success("PDFs integrados a la base de conocimiento.")
                             st.rerun()  # Recargar para actualizar la lista de archivos
@@ -121,20 +150,20 @@ class ChatApp:
         
         if self.docs_files or st.session_state.uploaded_pdfs or corpus_exists:
             
-            # Carga inicial de la base vectorial si no está en sesión
-            if st.session_state.vectordb is None:
-                with st.spinner("Cargando cerebro del chatbot..."):
-                    # Si hay PDFs en la carpeta docs, forzar regeneración para incluirlos
-                    should_regenerate = len(upload_docs) > 0
-                    st.session_state.vectordb = get_vectorstore(upload_docs, from_session_state=not should_regenerate)
+            # La base vectorial se resuelve en cada ejecución: es la instancia compartida
+            # del proceso y, si otra sesión o la ingesta publicaron un índice nuevo,
+            # se abre ese (el manifiesto decide; solo se regenera si cambiaron los
+            # PDFs, el corpus o la configuración)
+            with st.spinner("Cargando cerebro del chatbot..."):
+                vectordb = get_vectorstore(upload_docs, from_session_state=True)
 
-            # Si por alguna razón la carga falló, intentar regenerar
-            if st.session_state.vectordb is None:
-                 st.session_state.vectordb = get_vectorstore(upload_docs, from_session_state=False)
+                # Si por alguna razón la carga falló, intentar regenerar
+                if vectordb is None:
+                    vectordb = get_vectorstore(upload_docs, from_session_state=False)
 
             # Ejecutar el chat
-            if st.session_state.vectordb:
-                st.session_state.chat_history = chat(st.session_state.chat_history, st.session_state.vectordb)
+            if vectordb:
+                st.session_state.chat_history = chat(st.session_state.chat_history, vectordb)
             else:
                 st.error("No se pudo iniciar la base de datos vectorial.")
 
@@ -144,4 +173,8 @@ class ChatApp:
 # Punto de entrada principal
 if __name__ == "__main__":
     app = ChatApp()
-    app.run()
\ No newline at end of file
+    try:
+        app.run()
+    finally:
+        # Guardar el estado compacto de la conversación (también cuando st.rerun() corta la ejecución)
+        guardar_sesion(st)
\ No newline at end of file
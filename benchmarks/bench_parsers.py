@@ -0,0 +1,101 @@
+"""
+Micro-benchmark de los backends de parseo HTML del scraper.
+
+Parsea páginas guardadas (fixtures) con cada backend disponible, verifica que
+la salida clave-valor sea idéntica a la del backend de referencia (bs4) y
+reporta el tiempo medio por página.
+
+Uso:
+    python -m benchmarks.bench_parsers
+    python -m benchmarks.bench_parsers --fixtures knowledge_base/html --repeat 200
+
+Para capturar páginas reales: scrape_utpl_becas(html_dir="knowledge_base/html").
+Los archivos cuyo nombre empieza por 'listado' se tratan como páginas de
+listado; el resto como páginas de detalle.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ_REPO not in sys.path:
+    sys.path.insert(0, RAIZ_REPO)
+
+from utils.html_parsers import PARSERS, SECCIONES, get_parser
+
+FIXTURES_DEFAULT = os.path.join(RAIZ_REPO, "benchmarks", "fixtures")
+REFERENCIA = "bs4"
+
+
+def cargar_fixtures(directorio):
+    paginas = []
+    for ruta in sorted(glob.glob(os.path.join(directorio, "*.html"))):
+        with open(ruta, "r", encoding="utf-8") as f:
+            html = f.read()
+        tipo = "listado" if os.path.basename(ruta).startswith("listado") else "detalle"
+        paginas.append((os.path.basename(ruta), tipo, html))
+    return paginas
+
+
+def parsear(parser, tipo, html):
+    if tipo == "listado":
+        return parser.parsear_listado(html, SECCIONES)
+    return parser.parsear_detalle(html)
+
+
+def medir(parser, paginas, repeticiones):
+    """Tiempo medio por página en milisegundos."""
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for _, tipo, html in paginas:
+            parsear(parser, tipo, html)
+    return (time.perf_counter() - inicio) * 1000 / (repeticiones * len(paginas))
+
+
+def main():
+    parser_args = argparse.ArgumentParser(description="Benchmark de parsers HTML del scraper.")
+    parser_args.add_argument("--fixtures", default=FIXTURES_DEFAULT, help="Directorio con páginas .html")
+    parser_args.add_argument("--repeat", type=int, default=100, help="Repeticiones por página")
+    args = parser_args.parse_args()
+
+    paginas = cargar_fixtures(args.fixtures)
+    if not paginas:
+        sys.exit(f"❌ No hay archivos .html en {args.fixtures}")
+
+    backends = {}
+    for nombre in PARSERS:
+        try:
+            backends[nombre] = get_parser(nombre)
+        except ImportError as e:
+            print(f"⚠️ Backend '{nombre}' no disponible: {e}")
+
+    referencia = backends[REFERENCIA]
+    esperados = {nombre: parsear(referencia, tipo, html) for nombre, tipo, html in paginas}
+
+    # --- 1 Verificar salida idéntica ---
+    diferencias = 0
+    for nombre_backend, backend in backends.items():
+        for nombre, tipo, html in paginas:
+            obtenido = parsear(backend, tipo, html)
+            if obtenido != esperados[nombre]:
+                diferencias += 1
+                print(f"❌ {nombre_backend}: salida distinta en {nombre}")
+                print(f"   esperado: {esperados[nombre]}")
+                print(f"   obtenido: {obtenido}")
+
+    # --- 2 Medir tiempos ---
+    print(f"\n{len(paginas)} páginas × {args.repeat} repeticiones")
+    tiempo_ref = medir(referencia, paginas, args.repeat)
+    for nombre_backend, backend in backends.items():
+        tiempo = tiempo_ref if backend is referencia else medir(backend, paginas, args.repeat)
+        print(f"   {nombre_backend:>5}: {tiempo:.3f} ms/página  (×{tiempo_ref / tiempo:.1f} vs {REFERENCIA})")
+
+    if diferencias:
+        sys.exit(f"\n❌ {diferencias} página(s) con salida distinta.")
+    print("\n✅ Todos los backends producen la misma salida.")
+
+
+if __name__ == "__main__":
+    main()
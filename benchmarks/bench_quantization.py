@@ -0,0 +1,119 @@
+"""
+Benchmark de codificaciones del backend NumPy: recall vs memoria.
+
+Con los mismos embeddings (corpus real o sintético) construye un índice por
+codificación y compara contra la búsqueda exacta en float32:
+├── recall@k sin reordenar (solo puntaje aproximado) y con reordenamiento exacto
+├── memoria recorrida por consulta (matriz completa o solo los códigos)
+└── latencia de consulta y tiempo de construcción (incluye entrenar el cuantizador)
+
+Uso:
+    python -m benchmarks.bench_quantization                    # corpus real (PDFs + JSON)
+    python -m benchmarks.bench_quantization --synthetic 20000 --encodings int8 pq pq24
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ_REPO not in sys.path:
+    sys.path.insert(0, RAIZ_REPO)
+
+from benchmarks.bench_vectorstore import consultas_desde_corpus, corpus_real, corpus_sintetico
+from benchmarks.load_test import percentil
+
+CODIFICACIONES_DEFAULT = ["float16", "int8", "pq", "pq24"]
+FACTORES_RESCORE = [0, 2, 4, 8, 16, 32]
+
+
+def _tamano_directorio(directorio):
+    return sum(os.path.getsize(os.path.join(directorio, f)) for f in os.listdir(directorio))
+
+
+def construir(directorio, textos, vectores, metadatos, codificacion):
+    """Índice persistido; 'float16' es la matriz completa en media precisión sin cuantizar."""
+    from utils.vector_store import NumpyVectorStore
+    if codificacion == "float16":
+        store = NumpyVectorStore(None, persist_dir=directorio, dtype="float16")
+    else:
+        store = NumpyVectorStore(None, persist_dir=directorio, codificacion=codificacion)
+    t0 = time.perf_counter()
+    store.agregar_embeddings(textos, vectores, metadatos)
+    construccion_s = time.perf_counter() - t0
+    return NumpyVectorStore(None, persist_dir=directorio), construccion_s
+
+
+def medir(store, consultas, exactos, k):
+    """Recall@k promedio y latencias (ms) de las consultas."""
+    aciertos = []
+    latencias = []
+    for consulta, exacto in zip(consultas, exactos):
+        t0 = time.perf_counter()
+        filas = store.buscar_por_vector(consulta, k)
+        latencias.append((time.perf_counter() - t0) * 1000)
+        aciertos.append(len(exacto & {f for f, _ in filas}) / len(exacto))
+    return float(np.mean(aciertos)), latencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs memoria de las codificaciones del backend NumPy.")
+    parser.add_argument("--synthetic", type=int, help="Usar N vectores aleatorios en lugar del corpus real")
+    parser.add_argument("--queries", type=int, default=300, help="Número de consultas")
+    parser.add_argument("--k", type=int, default=15, help="Top-k por consulta (la app usa 15)")
+    parser.add_argument("--encodings", nargs="+", default=CODIFICACIONES_DEFAULT,
+                        help="Codificaciones a comparar: float16, int8, pq, pq<m> (m >= 1 y divisor de la "
+                             "dimensión). PQ necesita un rescore mayor que int8: la app usa 16 por defecto")
+    args = parser.parse_args()
+
+    os.chdir(RAIZ_REPO)
+    from utils.vector_store import NumpyVectorStore
+
+    if args.synthetic:
+        textos, vectores, metadatos = corpus_sintetico(args.synthetic)
+    else:
+        textos, vectores, metadatos = corpus_real()
+    vectores = (vectores / np.linalg.norm(vectores, axis=1, keepdims=True)).astype(np.float32)
+    consultas = consultas_desde_corpus(vectores, args.queries)
+
+    filas = []
+    with tempfile.TemporaryDirectory(prefix="bench_quantization_") as raiz:
+        # Referencia: búsqueda exacta en float32
+        referencia, construccion_s = construir(os.path.join(raiz, "float32"), textos, vectores, metadatos, None)
+        exactos = [{f for f, _ in referencia.buscar_por_vector(c, args.k)} for c in consultas]
+        _, latencias = medir(referencia, consultas, exactos, args.k)
+        filas.append(("float32", "-", 1.0, referencia._matriz.nbytes,
+                      _tamano_directorio(os.path.join(raiz, "float32")), latencias, construccion_s))
+
+        for codificacion in args.encodings:
+            directorio = os.path.join(raiz, codificacion)
+            store, construccion_s = construir(directorio, textos, vectores, metadatos, codificacion)
+            disco = _tamano_directorio(directorio)
+            if store.codificacion is None:
+                recall, latencias = medir(store, consultas, exactos, args.k)
+                filas.append((codificacion, "-", recall, store._matriz.nbytes, disco, latencias, construccion_s))
+                continue
+            # Lo que se recorre en cada consulta: códigos + parámetros del cuantizador
+            recorrido = store._codigos.nbytes + os.path.getsize(os.path.join(directorio, NumpyVectorStore.ARCHIVO_CUANTIZADOR))
+            for factor in FACTORES_RESCORE:
+                store.rescore = factor
+                recall, latencias = medir(store, consultas, exactos, args.k)
+                filas.append((codificacion, factor, recall, recorrido, disco, latencias, construccion_s))
+
+    base = filas[0][3]
+    print(f"\n{len(textos)} vectores × {vectores.shape[1]} dims | {args.queries} consultas | k={args.k}")
+    print(f"{'codif.':>8} {'rescore':>8} {'recall@k':>9} {'memoria':>10} {'vs f32':>7} {'disco':>10} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'constr. s':>10}")
+    for codificacion, factor, recall, memoria, disco, latencias, construccion_s in filas:
+        print(f"{codificacion:>8} {str(factor):>8} {recall:>9.3f} {memoria / 2**20:>8.2f}MB {base / memoria:>6.1f}x "
+              f"{disco / 2**20:>8.2f}MB {percentil(latencias, 50):>8.3f} {percentil(latencias, 95):>8.3f} "
+              f"{construccion_s:>10.2f}")
+    print("\nmemoria: bytes que recorre cada consulta (quedan residentes en el page cache);"
+          "\nla matriz completa sigue en disco para el reordenamiento y solo se leen los candidatos.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Benchmark de backends vectoriales: Chroma persistente vs NumPy en memoria mapeada.
+
+Construye ambos índices con los mismos embeddings (precalculados una sola vez)
+y, en un subproceso aislado por backend, mide la latencia de consulta top-k y
+el RSS adicional que agrega abrir y consultar el índice.
+
+Uso:
+    python -m benchmarks.bench_vectorstore                 # corpus real (PDFs + JSON)
+    python -m benchmarks.bench_vectorstore --synthetic 5000 --dtype float16
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ_REPO not in sys.path:
+    sys.path.insert(0, RAIZ_REPO)
+
+from benchmarks.load_test import percentil, rss_actual_mb
+
+DIMENSION = 384  # all-MiniLM-L6-v2
+TAMANO_LOTE_CHROMA = 5000
+
+
+# ============================================================
+# Corpus del benchmark
+# ============================================================
+def corpus_sintetico(n, semilla=0):
+    rng = np.random.default_rng(semilla)
+    vectores = rng.normal(size=(n, DIMENSION)).astype(np.float32)
+    textos = [f"fragmento sintético {i}" for i in range(n)]
+    metadatos = [{"source": "sintetico.pdf" if i % 2 else "corpus_utpl.json"} for i in range(n)]
+    return textos, vectores, metadatos
+
+
+def corpus_real():
+    """Fragmentos reales (PDFs en docs/ + corpus JSON) embebidos con el modelo de la app."""
+    from utils.prepare_vectordb import (
+        extract_json_text, extract_pdf_text, get_embedding_model, get_text_chunks,
+    )
+    pdfs = [f for f in os.listdir("docs") if f.endswith(".pdf")] if os.path.exists("docs") else []
+    chunks = get_text_chunks(extract_pdf_text(pdfs) + extract_json_text())
+    if not chunks:
+        sys.exit("❌ No hay documentos para el benchmark. Usa --synthetic N.")
+    textos = [c.page_content for c in chunks]
+    print(f"Embebiendo {len(textos)} fragmentos reales...")
+    vectores = np.asarray(get_embedding_model().embed_documents(textos), dtype=np.float32)
+    return textos, vectores, [c.metadata for c in chunks]
+
+
+def consultas_desde_corpus(vectores, n, semilla=1):
+    """Consultas cercanas a fragmentos existentes (vector + ruido), normalizadas."""
+    rng = np.random.default_rng(semilla)
+    base = vectores[rng.integers(0, len(vectores), size=n)]
+    consultas = base + rng.normal(scale=0.05, size=base.shape).astype(np.float32)
+    return consultas / np.linalg.norm(consultas, axis=1, keepdims=True)
+
+
+# ============================================================
+# Construcción de los índices
+# ============================================================
+def construir_indices(directorio, textos, vectores, metadatos, dtype):
+    import chromadb
+    from utils.vector_store import NumpyVectorStore, _chroma_settings
+
+    store = NumpyVectorStore(None, persist_dir=os.path.join(directorio, "numpy"), dtype=dtype)
+    store.agregar_embeddings(textos, vectores, metadatos)
+
+    client = chromadb.PersistentClient(path=os.path.join(directorio, "chroma"), settings=_chroma_settings())
+    coleccion = client.get_or_create_collection("langchain")
+    for inicio in range(0, len(textos), TAMANO_LOTE_CHROMA):
+        fin = inicio + TAMANO_LOTE_CHROMA
+        coleccion.add(
+            ids=[str(i) for i in range(inicio, min(fin, len(textos)))],
+            embeddings=vectores[inicio:fin].tolist(),
+            documents=textos[inicio:fin],
+            metadatas=metadatos[inicio:fin],
+        )
+
+
+# ============================================================
+# Worker aislado: abre un backend y mide consultas
+# ============================================================
+def ejecutar_worker(backend, directorio, k):
+    consultas = np.load(os.path.join(directorio, "queries.npy"))
+    rss_inicial = rss_actual_mb()
+
+    t0 = time.perf_counter()
+    if backend == "numpy":
+        from utils.vector_store import NumpyVectorStore
+        store = NumpyVectorStore(None, persist_dir=os.path.join(directorio, "numpy"))
+    else:
+        import chromadb
+        from langchain_community.vectorstores import Chroma
+        from utils.vector_store import _chroma_settings
+        client = chromadb.PersistentClient(path=os.path.join(directorio, "chroma"), settings=_chroma_settings())
+        store = Chroma(client=client)
+    carga_ms = (time.perf_counter() - t0) * 1000
+    rss_cargado = rss_actual_mb()
+
+    latencias = []
+    for consulta in consultas:
+        t0 = time.perf_counter()
+        store.similarity_search_by_vector(consulta.tolist(), k=k)
+        latencias.append((time.perf_counter() - t0) * 1000)
+
+    print(json.dumps({
+        "backend": backend,
+        "load_ms": carga_ms,
+        "p50_ms": percentil(latencias, 50),
+        "p95_ms": percentil(latencias, 95),
+        "p99_ms": percentil(latencias, 99),
+        "rss_load_mb": rss_cargado - rss_inicial,
+        "rss_total_mb": rss_actual_mb() - rss_inicial,
+    }))
+
+
+# ============================================================
+# Ejecución directa
+# ============================================================
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Chroma vs NumPy mmap.")
+    parser.add_argument("--synthetic", type=int, help="Usar N vectores aleatorios en lugar del corpus real")
+    parser.add_argument("--queries", type=int, default=500, help="Número de consultas")
+    parser.add_argument("--k", type=int, default=15, help="Top-k por consulta (la app usa 15)")
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"], help="dtype del backend NumPy")
+    parser.add_argument("--worker", choices=["chroma", "numpy"], help=argparse.SUPPRESS)
+    parser.add_argument("--dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        ejecutar_worker(args.worker, args.dir, args.k)
+        return
+
+    os.chdir(RAIZ_REPO)
+    if args.synthetic:
+        textos, vectores, metadatos = corpus_sintetico(args.synthetic)
+    else:
+        textos, vectores, metadatos = corpus_real()
+    vectores = vectores / np.linalg.norm(vectores, axis=1, keepdims=True)
+
+    with tempfile.TemporaryDirectory(prefix="bench_vectorstore_") as directorio:
+        print(f"Construyendo índices con {len(textos)} vectores...")
+        construir_indices(directorio, textos, vectores, metadatos, args.dtype)
+        np.save(os.path.join(directorio, "queries.npy"), consultas_desde_corpus(vectores, args.queries))
+
+        resultados = []
+        for backend in ("chroma", "numpy"):
+            salida = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_vectorstore",
+                 "--worker", backend, "--dir", directorio, "--k", str(args.k)],
+                cwd=RAIZ_REPO, capture_output=True, text=True, check=True,
+            )
+            resultados.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+
+    print(f"\n{len(textos)} vectores × {DIMENSION} dims | {args.queries} consultas | k={args.k} | numpy={args.dtype}")
+    print(f"{'backend':>8} {'carga ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'RSS carga':>10} {'RSS total':>10}")
+    for r in resultados:
+        print(f"{r['backend']:>8} {r['load_ms']:>9.1f} {r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f} "
+              f"{r['p99_ms']:>8.3f} {r['rss_load_mb']:>8.1f}MB {r['rss_total_mb']:>8.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+Prueba de carga de sesiones concurrentes para app.py.
+
+Simula N sesiones de navegador ejecutando ChatApp mediante el AppTest de
+Streamlit, con un LLM simulado (sin llamadas a Gemini) y una base vectorial
+ya construida en disco. El registro de consultas y la caché de servicio se
+desactivan para medir siempre el camino RAG completo. Reporta throughput, latencias p50/p95/p99 por turno,
+memoria por sesión (desde una sesión de calentamiento que carga el modelo y
+el índice) y cargas del modelo de embeddings por worker.
+
+Uso (desde la raíz del repositorio, sin conexión):
+    python -m benchmarks.load_test --sessions 20 --workers 2 --turns 3
+    python -m benchmarks.load_test --sessions 20 --workers 4 --session-store sqlite
+"""
+import argparse
+import gc
+import json
+import math
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from unittest import mock
+
+# La raíz del repositorio debe estar en el path para importar app.py y utils/
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ_REPO not in sys.path:
+    sys.path.insert(0, RAIZ_REPO)
+
+PREGUNTAS_DEFAULT = [
+    "Hola",
+    "¿Qué requisitos tiene la beca de excelencia?",
+    "¿Qué porcentaje cubre la beca de inclusión?",
+    "¿Cómo renuevo mi beca?",
+    "Dame el enlace de la beca de convenios institucionales",
+    "Gracias",
+]
+
+
+# ============================================================
+# Métricas del proceso
+# ============================================================
+def rss_actual_mb():
+    """RSS actual del proceso en MB (Linux: /proc; otros: pico de ru_maxrss)."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reporta bytes, Linux reporta KB
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano (p entre 0 y 100)."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    rango = max(1, math.ceil(p / 100 * len(ordenados)))
+    return ordenados[rango - 1]
+
+
+# ============================================================
+# LLM simulado y contadores de recursos pesados
+# ============================================================
+def crear_llm_simulado(latencia_llm):
+    """Devuelve una fábrica compatible con ChatGoogleGenerativeAI(...) sin red."""
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    class LLMSimulado(FakeListChatModel):
+        latencia: float = 0.0
+
+        def _call(self, *args, **kwargs):
+            if self.latencia:
+                time.sleep(self.latencia)
+            return super()._call(*args, **kwargs)
+
+    def fabrica(**kwargs):
+        return LLMSimulado(
+            responses=["Respuesta simulada de BecaBot UTPL."],
+            latencia=latencia_llm,
+        )
+
+    return fabrica
+
+
+def instrumentar(contadores, latencia_llm):
+    """
+    Aplica los parches del worker: LLM simulado, scraping deshabilitado y
+    contadores de cargas del modelo de embeddings y de construcción del chain.
+    """
+    import utils.chatbot as chatbot
+    import utils.prepare_vectordb as prepare_vectordb
+
+    clase_embeddings = prepare_vectordb.HuggingFaceEmbeddings
+    construir_chain = chatbot.get_context_retriever_chain
+    obtener_vectorstore = prepare_vectordb.get_vectorstore
+    regenerar = prepare_vectordb._regenerar
+
+    def embeddings_contados(*args, **kwargs):
+        contadores["model_loads"] += 1
+        return clase_embeddings(*args, **kwargs)
+
+    def chain_contado(*args, **kwargs):
+        contadores["chain_builds"] += 1
+        return construir_chain(*args, **kwargs)
+
+    def vectorstore_contado(*args, **kwargs):
+        contadores["vectorstore_calls"] += 1
+        return obtener_vectorstore(*args, **kwargs)
+
+    def regenerar_contado(*args, **kwargs):
+        # Cuenta también las regeneraciones por manifiesto desactualizado
+        contadores["index_rebuilds"] += 1
+        return regenerar(*args, **kwargs)
+
+    def scraping_deshabilitado(*args, **kwargs):
+        raise RuntimeError("El scraping está deshabilitado durante la prueba de carga.")
+
+    parches = [
+        mock.patch.object(chatbot, "ChatGoogleGenerativeAI", crear_llm_simulado(latencia_llm)),
+        mock.patch.object(chatbot, "get_context_retriever_chain", chain_contado),
+        mock.patch.object(prepare_vectordb, "HuggingFaceEmbeddings", embeddings_contados),
+        mock.patch.object(prepare_vectordb, "get_vectorstore", vectorstore_contado),
+        mock.patch.object(prepare_vectordb, "_regenerar", regenerar_contado),
+        mock.patch("utils.web_scraper.scrape_utpl_becas", scraping_deshabilitado),
+    ]
+    # Los módulos que importan get_vectorstore por nombre también deben verlo
+    for modulo in ("utils.save_docs",):
+        parches.append(mock.patch(f"{modulo}.get_vectorstore", vectorstore_contado))
+
+    for parche in parches:
+        parche.start()
+    return parches
+
+
+# ============================================================
+# Worker: ejecuta un grupo de sesiones simuladas
+# ============================================================
+def ejecutar_worker(id_worker, num_sesiones, turnos, preguntas, latencia_llm, timeout):
+    """
+    Simula `num_sesiones` sesiones dentro de un mismo proceso (como un worker
+    de Streamlit). AppTest usa un Runtime global, así que los scripts se
+    ejecutan uno a la vez, pero las sesiones se intercalan turno a turno para
+    que todas permanezcan vivas en memoria al mismo tiempo.
+
+    Antes de medir se abre una sesión de calentamiento que carga el modelo de
+    embeddings y la base vectorial del proceso: la memoria por sesión se mide
+    desde ahí, sin repartir esa carga única entre las sesiones.
+    """
+    os.chdir(RAIZ_REPO)
+    from streamlit.testing.v1 import AppTest
+
+    contadores = {"model_loads": 0, "chain_builds": 0, "vectorstore_calls": 0, "index_rebuilds": 0}
+    instrumentar(contadores, latencia_llm)
+
+    rss_inicial = rss_actual_mb()
+    errores = 0
+
+    # --- 0 Sesión de calentamiento (modelo e índice compartidos del proceso) ---
+    calentamiento = AppTest.from_file(os.path.join(RAIZ_REPO, "app.py"), default_timeout=timeout)
+    t0 = time.perf_counter()
+    try:
+        calentamiento.run()
+        if calentamiento.exception:
+            errores += 1
+    except Exception as e:
+        print(f"⚠️ [worker {id_worker}] Error en la sesión de calentamiento: {e}")
+        errores += 1
+    calentamiento_ms = (time.perf_counter() - t0) * 1000
+    del calentamiento
+    gc.collect()
+    rss_calentado = rss_actual_mb()
+
+    inicio = time.perf_counter()
+    sesiones = []
+    latencias_inicio = []
+
+    # --- 1 Abrir todas las sesiones (primera ejecución del script) ---
+    for _ in range(num_sesiones):
+        app = AppTest.from_file(os.path.join(RAIZ_REPO, "app.py"), default_timeout=timeout)
+        t0 = time.perf_counter()
+        try:
+            app.run()
+            if app.exception:
+                errores += 1
+        except Exception as e:
+            print(f"⚠️ [worker {id_worker}] Error al abrir sesión: {e}")
+            errores += 1
+        latencias_inicio.append((time.perf_counter() - t0) * 1000)
+        sesiones.append(app)
+
+    rss_con_sesiones = rss_actual_mb()
+
+    # --- 2 Turnos de conversación intercalados entre sesiones ---
+    latencias_turno = []
+    for turno in range(turnos):
+        for i, app in enumerate(sesiones):
+            pregunta = preguntas[(i + turno) % len(preguntas)]
+            t0 = time.perf_counter()
+            try:
+                app.chat_input[0].set_value(pregunta).run()
+                if app.exception:
+                    errores += 1
+            except Exception as e:
+                print(f"⚠️ [worker {id_worker}] Error en turno {turno + 1}: {e}")
+                errores += 1
+            latencias_turno.append((time.perf_counter() - t0) * 1000)
+
+    duracion = time.perf_counter() - inicio
+    rss_final = rss_actual_mb()
+
+    return {
+        "worker": id_worker,
+        "sessions": num_sesiones,
+        "turns": len(latencias_turno),
+        "errors": errores,
+        "duration_s": duracion,
+        "session_start_ms": latencias_inicio,
+        "turn_ms": latencias_turno,
+        "warmup_ms": calentamiento_ms,
+        "rss_start_mb": rss_inicial,
+        "rss_warm_mb": rss_calentado,
+        "rss_sessions_mb": rss_con_sesiones,
+        "rss_end_mb": rss_final,
+        "mb_per_session": (rss_final - rss_calentado) / max(num_sesiones, 1),
+        **contadores,
+    }
+
+
+def _worker_en_subproceso(args):
+    return ejecutar_worker(*args)
+
+
+# ============================================================
+# Reporte
+# ============================================================
+def imprimir_reporte(resultados, duracion_total):
+    latencias = [ms for r in resultados for ms in r["turn_ms"]]
+    inicios = [ms for r in resultados for ms in r["session_start_ms"]]
+    total_turnos = sum(r["turns"] for r in resultados)
+
+    print("\n" + "=" * 60)
+    print("Resultados de la prueba de carga")
+    print("=" * 60)
+    print(f"Sesiones: {sum(r['sessions'] for r in resultados)} | "
+          f"Workers: {len(resultados)} | Turnos: {total_turnos} | "
+          f"Errores: {sum(r['errors'] for r in resultados)}")
+    print(f"Duración total: {duracion_total:.2f} s | "
+          f"Throughput: {total_turnos / duracion_total if duracion_total else 0:.2f} turnos/s")
+    print(f"Latencia por turno (ms):  p50={percentil(latencias, 50):.1f}  "
+          f"p95={percentil(latencias, 95):.1f}  p99={percentil(latencias, 99):.1f}")
+    print(f"Inicio de sesión (ms):    p50={percentil(inicios, 50):.1f}  "
+          f"p95={percentil(inicios, 95):.1f}  p99={percentil(inicios, 99):.1f}")
+    print("-" * 60)
+    for r in resultados:
+        print(f"Worker {r['worker']}: {r['sessions']} sesiones | "
+              f"RSS {r['rss_start_mb']:.0f} → {r['rss_warm_mb']:.0f} (calentado) → {r['rss_end_mb']:.0f} MB "
+              f"({r['mb_per_session']:.1f} MB/sesión) | calentamiento: {r['warmup_ms']:.0f} ms | "
+              f"cargas de modelo: {r['model_loads']} | chains: {r['chain_builds']} | "
+              f"reconstrucciones de índice: {r['index_rebuilds']}")
+
+
+# ============================================================
+# Ejecución directa
+# ============================================================
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de sesiones concurrentes para BecaBot.")
+    parser.add_argument("--sessions", type=int, default=10, help="Número total de sesiones simuladas")
+    parser.add_argument("--workers", type=int, default=1, help="Procesos worker (cada uno como un app.py)")
+    parser.add_argument("--turns", type=int, default=3, help="Preguntas por sesión")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Latencia simulada del LLM en segundos")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Timeout por ejecución del script (s)")
+    parser.add_argument("--questions", help="Archivo de texto con una pregunta por línea")
+    parser.add_argument("--json", dest="json_path", help="Guardar resultados crudos en este archivo JSON")
+    parser.add_argument("--session-store", choices=["memory", "sqlite"],
+                        help="Almacén de sesiones de la app (por defecto BECABOT_SESSION_STORE)")
+    args = parser.parse_args()
+
+    # Los workers se crean con spawn y heredan el entorno
+    if args.session_store:
+        os.environ["BECABOT_SESSION_STORE"] = args.session_store
+    # Las preguntas sintéticas no deben ir al registro real (alimentaría a cache_warm)
+    # ni llenar la caché de servicio (las corridas siguientes medirían aciertos, no RAG)
+    os.environ["BECABOT_QUERY_LOG_ENABLED"] = "0"
+    os.environ["BECABOT_CACHE"] = "0"
+
+    os.chdir(RAIZ_REPO)
+    if not os.path.exists("knowledge_base/corpus_utpl.json"):
+        sys.exit("❌ Falta knowledge_base/corpus_utpl.json: la prueba de carga no ejecuta scraping.")
+    from utils.vector_store import get_backend
+    backend = get_backend()
+    if not backend.existe():
+        sys.exit(f"❌ Falta la base vectorial ({backend.nombre}) en '{backend.persist_dir}'. "
+                 "Constrúyela antes con: python -m utils.prepare_vectordb")
+
+    preguntas = PREGUNTAS_DEFAULT
+    if args.questions:
+        with open(args.questions, "r", encoding="utf-8") as f:
+            preguntas = [linea.strip() for linea in f if linea.strip()]
+
+    # Repartir sesiones entre workers
+    reparto = [args.sessions // args.workers + (1 if i < args.sessions % args.workers else 0)
+               for i in range(args.workers)]
+    tareas = [(i, n, args.turns, preguntas, args.llm_latency, args.timeout)
+              for i, n in enumerate(reparto) if n > 0]
+
+    print(f"Iniciando prueba de carga: {args.sessions} sesiones en {len(tareas)} worker(s)...")
+    inicio = time.perf_counter()
+    if len(tareas) == 1:
+        resultados = [ejecutar_worker(*tareas[0])]
+    else:
+        contexto = multiprocessing.get_context("spawn")
+        with contexto.Pool(len(tareas)) as pool:
+            resultados = pool.map(_worker_en_subproceso, tareas)
+    duracion_total = time.perf_counter() - inicio
+
+    imprimir_reporte(resultados, duracion_total)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"duration_s": duracion_total, "workers": resultados}, f, indent=2)
+        print(f"Resultados guardados en {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
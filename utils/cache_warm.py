@@ -0,0 +1,164 @@
+import os
+import argparse
+import threading
+from collections import Counter
+import numpy as np
+from utils.prepare_vectordb import get_embedding_model
+from utils.query_log import QUERY_LOG, leer_registro
+from utils.serving_cache import (
+    cache_habilitado, guardar_recuperacion, guardar_respuesta, huella_indice, purgar_obsoletas,
+)
+from utils.vector_store import get_backend
+
+# ============================================================
+# Calentamiento de cachés con las preguntas más frecuentes
+# ============================================================
+# A partir del registro de consultas:
+# 1. Cuenta las preguntas normalizadas que fueron a RAG.
+# 2. Agrupa las parecidas (similitud coseno de embeddings) en clusters.
+# 3. Para los clusters más frecuentes precalcula la recuperación de cada
+#    variante y la respuesta del representante, sobre el índice vigente.
+#
+# Cada regeneración desde la app (get_vectorstore) lo lanza sola en segundo
+# plano; las respuestas se precalculan solo con BECABOT_WARM_ANSWERS=1 para
+# no consumir cuota de Gemini sin pedirlo. Manualmente o desde la ingesta:
+#     python -m utils.cache_warm --top 50
+#     python -m utils.ingest --only-changed --warm-cache
+UMBRAL_CLUSTER = 0.90       # variantes de la misma pregunta (p. ej. con/sin "beca")
+TOP_DEFAULT = 50
+MIN_FRECUENCIA = 2
+
+# Un solo calentamiento en segundo plano a la vez por proceso
+_lock_segundo_plano = threading.Lock()
+
+
+def preguntas_frecuentes(ruta_log=None):
+    """Contador de preguntas normalizadas que se respondieron con RAG."""
+    return Counter(
+        r["pregunta"] for r in leer_registro(ruta_log)
+        if r.get("ruta") == "informacion" and r.get("pregunta")
+    )
+
+
+def agrupar_preguntas(frecuencias, umbral=UMBRAL_CLUSTER):
+    """
+    Clustering voraz: recorre las preguntas de más a menos frecuente y une
+    cada una al primer representante con similitud >= umbral.
+
+    Devuelve una lista de clusters [{"representante", "variantes", "frecuencia"}]
+    ordenada por frecuencia total.
+    """
+    preguntas = [p for p, _ in frecuencias.most_common()]
+    if not preguntas:
+        return []
+    vectores = np.asarray(get_embedding_model().embed_documents(preguntas), dtype=np.float32)
+
+    clusters = []
+    representantes = []     # índices en `preguntas`
+    for i, pregunta in enumerate(preguntas):
+        if representantes:
+            similitudes = vectores[representantes] @ vectores[i]
+            mejor = int(np.argmax(similitudes))
+            if similitudes[mejor] >= umbral:
+                clusters[mejor]["variantes"].append(pregunta)
+                clusters[mejor]["frecuencia"] += frecuencias[pregunta]
+                continue
+        representantes.append(i)
+        clusters.append({"representante": pregunta, "variantes": [pregunta], "frecuencia": frecuencias[pregunta]})
+
+    return sorted(clusters, key=lambda c: c["frecuencia"], reverse=True)
+
+
+def calentar_cache(top=TOP_DEFAULT, min_frecuencia=MIN_FRECUENCIA, con_respuestas=True,
+                   dry_run=False, ruta_log=None, backend=None, vectordb=None):
+    """
+    Precalcula las cachés de servicio para los clusters más frecuentes sobre
+    el índice que hay en disco (no lo regenera; si se pasa `vectordb`, se usa
+    esa instancia en lugar de abrirlo de nuevo). Devuelve la cantidad de
+    clusters calentados.
+    """
+    if not dry_run and not cache_habilitado():
+        print("La caché de servicio está desactivada (BECABOT_CACHE=0): no se calienta.")
+        return 0
+    frecuencias = preguntas_frecuentes(ruta_log)
+    clusters = [c for c in agrupar_preguntas(frecuencias) if c["frecuencia"] >= min_frecuencia][:top]
+    print(f"{sum(frecuencias.values())} consultas RAG en {ruta_log or QUERY_LOG}: "
+          f"{len(frecuencias)} preguntas distintas, {len(clusters)} clusters a calentar.")
+
+    if dry_run:
+        for c in clusters:
+            print(f"   {c['frecuencia']:>5}  {c['representante']}  (+{len(c['variantes']) - 1} variantes)")
+        return len(clusters)
+
+    backend_vectorial = get_backend(backend)
+    huella = huella_indice(backend_vectorial.persist_dir)
+    if huella is None:
+        print("⚠️ El índice no tiene manifiesto: no se puede calentar la caché.")
+        return 0
+    borradas = purgar_obsoletas(huella)
+    if borradas:
+        print(f"Se eliminaron {borradas} entradas de índices anteriores.")
+
+    if vectordb is None:
+        vectordb = backend_vectorial.cargar(get_embedding_model())
+    retriever = vectordb.as_retriever(search_type="similarity", search_kwargs={"k": 15})
+    chain = None
+    if con_respuestas:
+        # Import diferido: la cadena necesita Streamlit y la API de Gemini
+        from utils.chatbot import get_context_retriever_chain
+        chain = get_context_retriever_chain(vectordb, persist_dir=backend_vectorial.persist_dir)
+
+    for c in clusters:
+        for variante in c["variantes"]:
+            guardar_recuperacion(variante, retriever.invoke(variante), huella)
+        if chain is None:
+            continue
+        try:
+            respuesta = chain.invoke({"input": c["representante"], "chat_history": []})
+        except Exception as e:
+            print(f"⚠️ No se pudo generar la respuesta para '{c['representante']}': {e}")
+            continue
+        for variante in c["variantes"]:
+            guardar_respuesta(variante, respuesta["answer"], respuesta["context"], huella)
+
+    print(f"✅ Caché calentada para {len(clusters)} clusters (índice {huella}).")
+    return len(clusters)
+
+
+def calentar_en_segundo_plano(backend=None, vectordb=None):
+    """
+    Lanza calentar_cache en un hilo daemon (tras regenerar el índice, sin
+    demorar a la sesión que lo pidió). Si ya hay uno en curso, no lanza otro.
+    Devuelve el hilo o None.
+    """
+    if not cache_habilitado() or not _lock_segundo_plano.acquire(blocking=False):
+        return None
+
+    def calentar():
+        try:
+            calentar_cache(con_respuestas=os.getenv("BECABOT_WARM_ANSWERS", "0") == "1",
+                           backend=backend, vectordb=vectordb)
+        except Exception as e:
+            print(f"⚠️ [cache] Error al calentar la caché: {e}")
+        finally:
+            _lock_segundo_plano.release()
+
+    hilo = threading.Thread(target=calentar, name="calentar-cache", daemon=True)
+    hilo.start()
+    return hilo
+
+
+# ============================================================
+# Ejecución directa
+# ============================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precalcula las cachés con las preguntas más frecuentes.")
+    parser.add_argument("--top", type=int, default=TOP_DEFAULT, help="Número de clusters a calentar")
+    parser.add_argument("--min-count", type=int, default=MIN_FRECUENCIA, help="Frecuencia mínima del cluster")
+    parser.add_argument("--no-answers", action="store_true", help="Solo recuperación (sin llamar a Gemini)")
+    parser.add_argument("--dry-run", action="store_true", help="Mostrar los clusters sin escribir la caché")
+    parser.add_argument("--log", help=f"Registro de consultas (por defecto {QUERY_LOG})")
+    parser.add_argument("--backend", help="'chroma' o 'numpy' (por defecto BECABOT_VECTOR_BACKEND)")
+    args = parser.parse_args()
+
+    calentar_cache(args.top, args.min_count, not args.no_answers, args.dry_run, args.log, args.backend)
@@ -1,5 +1,7 @@
 import streamlit as st
 import os
+import time
+import threading
 from collections import defaultdict
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
@@ -11,13 +13,32 @@ from google.api_core.exceptions import ResourceExhausted, PermissionDenied, Serv
 
 # Importar módulo de voz
 from utils.voice_input import record_and_transcribe
+from utils.intent_router import enrutar_consulta, registrar_latencia_rag
+from utils.session_overlay import RetrieverCombinado
+from utils.query_log import registrar_consulta
+from utils.dedupe import fuentes_de
+from utils.serving_cache import RetrieverCacheado, buscar_respuesta
+from utils.vector_store import get_backend
 
 # ---------------------------------------------------------
 #  Crear la cadena de recuperación + generación (RAG)
 # ---------------------------------------------------------
-def get_context_retriever_chain(vectordb):
+def crear_recuperador(vectordb, persist_dir=None):
+    """Recuperador de la base compartida con caché de servicio (persist_dir indica el índice)."""
+    retriever = vectordb.as_retriever(
+        search_type="similarity",
+        search_kwargs={"k": 15}  # Aumentado a 15 para mejor cobertura
+    )
+    return RetrieverCacheado(base=retriever, persist_dir=persist_dir)
+
+
+def get_context_retriever_chain(vectordb, overlay=None, persist_dir=None, recuperador=None):
     """
     Crea la cadena de recuperación + generación con el modelo Gemini.
+    La recuperación de la base compartida pasa por la caché de servicio
+    (`recuperador`, o uno nuevo de crear_recuperador sobre persist_dir).
+    Si la sesión tiene un overlay de PDFs propios, sus resultados se fusionan
+    con los de la base compartida.
     """
     load_dotenv()
 
@@ -30,10 +51,9 @@ def get_context_retriever_chain(vectordb):
             convert_system_message_to_human=True
         )
 
-        retriever = vectordb.as_retriever(
-            search_type="similarity",
-            search_kwargs={"k": 15}  # Aumentado a 15 para mejor cobertura
-        )
+        retriever = recuperador or crear_recuperador(vectordb, persist_dir)
+        if overlay is not None:
+            retriever = RetrieverCombinado(base=retriever, overlay=overlay, k=15)
 
         prompt = ChatPromptTemplate.from_messages([
     ("system",
@@ -79,6 +99,44 @@ def get_context_retriever_chain(vectordb):
         return None
 
 
+# Cadena compartida por las sesiones del proceso: (vectordb, cadena, recuperador).
+# La de una sesión con PDFs propios se guarda en su overlay (OverlayIndex.cadena)
+# y se libera con él.
+_cadena_compartida = None
+_lock_cadena = threading.Lock()
+
+
+def _crear_cadena(vectordb, overlay=None):
+    # Misma resolución del backend que get_vectorstore: la caché sigue al índice servido
+    recuperador = crear_recuperador(vectordb, get_backend().persist_dir)
+    cadena = get_context_retriever_chain(vectordb, overlay, recuperador=recuperador)
+    return (cadena, recuperador) if cadena is not None else (None, None)
+
+
+def obtener_cadena(vectordb, overlay=None):
+    """
+    Devuelve (cadena RAG, recuperador con caché) para la sesión. Sin overlay,
+    todas las sesiones del proceso usan la misma cadena (misma base vectorial
+    compartida); con PDFs propios de la sesión, la cadena se guarda en el overlay.
+    Se llama en cada ejecución: si otra sesión o la ingesta publicaron un
+    índice nuevo, `vectordb` es otra instancia y la cadena se vuelve a crear.
+    El recuperador indica después de cada consulta si hubo acierto en la caché.
+    """
+    global _cadena_compartida
+    with _lock_cadena:
+        guardada = _cadena_compartida if overlay is None else overlay.cadena
+        if guardada is None or guardada[0] is not vectordb:
+            cadena, recuperador = _crear_cadena(vectordb, overlay)
+            if cadena is None:
+                return None, None
+            guardada = (vectordb, cadena, recuperador)
+            if overlay is None:
+                _cadena_compartida = guardada
+            else:
+                overlay.cadena = guardada
+        return guardada[1:]
+
+
 # ---------------------------------------------------------
 #  Obtener respuesta del modelo
 # ---------------------------------------------------------
@@ -105,9 +163,8 @@ def chat(chat_history, vectordb):
     """
     Maneja la interacción con el chatbot: texto + voz.
     """
-    # Cachear el chain para no recrearlo con cada mensaje
-    if "retrieval_chain" not in st.session_state:
-        st.session_state.retrieval_chain = get_context_retriever_chain(vectordb)
+    # La cadena vive en el proceso (no en la sesión) y sigue al índice vigente
+    retrieval_chain, recuperador = obtener_cadena(vectordb, st.session_state.get("overlay_index"))
 
     # Mostrar historial de chat PRIMERO (para que el usuario vea la conversación continua)
     for message in chat_history:
@@ -138,10 +195,34 @@ def chat(chat_history, vectordb):
         with st.chat_message("Human"):
             st.write(user_query)
         
-        # Generar respuesta con historial y base vectorial
-        response, context = get_response(
-            user_query, chat_history, vectordb, st.session_state.retrieval_chain
-        )
+        # Charla y enlaces se resuelven localmente; el resto va a RAG
+        inicio = time.perf_counter()
+        ruta = enrutar_consulta(user_query, chat_history)
+        estado_cache = None
+        # Las respuestas precalculadas solo valen para una primera pregunta
+        # sin historial ni PDFs propios de la sesión
+        precalculada = None
+        if ruta.respuesta is None and not chat_history and st.session_state.get("overlay_index") is None:
+            precalculada = buscar_respuesta(user_query)
+
+        if ruta.respuesta is not None:
+            response, context = ruta.respuesta, ruta.contexto
+        elif precalculada is not None:
+            response, context = precalculada
+            estado_cache = "respuesta"
+        else:
+            # Generar respuesta con historial y base vectorial
+            inicio_rag = time.perf_counter()
+            response, context = get_response(
+                user_query, chat_history, vectordb, retrieval_chain
+            )
+            registrar_latencia_rag((time.perf_counter() - inicio_rag) * 1000)
+            # El recuperador anotó si la caché de recuperación acertó (sin otra consulta a SQLite)
+            if recuperador is not None:
+                estado_cache = recuperador.estado(user_query)
+
+        # El registro se escribe en segundo plano, fuera del camino de la respuesta
+        registrar_consulta(user_query, ruta.nombre, (time.perf_counter() - inicio) * 1000, context, estado_cache)
 
         # Mostrar respuesta del bot
         with st.chat_message("AI"):
@@ -160,8 +241,8 @@ def chat(chat_history, vectordb):
             pdf_sources = {}
             web_sources = {}
             
-            for doc in context:
-                metadata = doc.metadata
+            # Un fragmento deduplicado trae las fuentes de todas sus copias
+            for metadata in (fuente for doc in context for fuente in fuentes_de(doc.metadata)):
                 source = metadata.get('source', 'Desconocido')
                 
                 if source.endswith('.pdf'):
@@ -0,0 +1,190 @@
+import os
+import re
+import json
+import zlib
+import unicodedata
+import numpy as np
+
+# ============================================================
+# Detección de fragmentos casi duplicados (MinHash + LSH)
+# ============================================================
+# El manual en PDF repite buena parte de las páginas de becas del corpus web.
+# Antes de embeber, los fragmentos se comparan por sus shingles de palabras:
+# ├── MinHash: firma de NUM_PERMUTACIONES mínimos que estima la similitud de Jaccard
+# ├── LSH: la firma se parte en BANDAS; dos fragmentos son candidatos si
+# │         coinciden en alguna banda completa
+# └── los candidatos con Jaccard estimada >= UMBRAL_JACCARD forman un cluster
+#
+# De cada cluster queda una copia canónica (la más larga) con los metadatos
+# de todas sus fuentes en FUENTES_FUSIONADAS, así la barra lateral sigue
+# mostrando todos los PDFs y becas de donde viene el texto.
+TAMANO_SHINGLE = 5          # palabras por shingle
+NUM_PERMUTACIONES = 128
+BANDAS = 16                 # 16 bandas x 8 filas: umbral LSH ≈ (1/16)^(1/8) ≈ 0.71
+UMBRAL_JACCARD = 0.70
+
+# Metadato con la lista (JSON) de las fuentes de todos los fragmentos fusionados.
+# Es un string porque Chroma solo acepta metadatos escalares.
+FUENTES_FUSIONADAS = "fuentes_fusionadas"
+CAMPOS_FUENTE = ("source", "page", "titulo", "url")
+
+_PRIMO = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, _PRIMO, size=NUM_PERMUTACIONES, dtype=np.uint64)
+_B = _rng.integers(0, _PRIMO, size=NUM_PERMUTACIONES, dtype=np.uint64)
+
+
+def dedupe_habilitado():
+    return os.getenv("BECABOT_DEDUPE", "1") != "0"
+
+
+def config_dedupe():
+    """Parámetros que se registran en el manifiesto (None si está desactivado)."""
+    if not dedupe_habilitado():
+        return None
+    return {"method": "minhash-lsh", "shingle": TAMANO_SHINGLE, "permutations": NUM_PERMUTACIONES,
+            "bands": BANDAS, "threshold": UMBRAL_JACCARD}
+
+
+# ============================================================
+# Firmas MinHash
+# ============================================================
+def _palabras(texto):
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.findall(r"\w+", texto)
+
+
+def firma_minhash(texto):
+    """Firma MinHash (uint64[NUM_PERMUTACIONES]) de los shingles de palabras del texto."""
+    palabras = _palabras(texto)
+    tamano = min(TAMANO_SHINGLE, len(palabras)) or 1
+    shingles = {" ".join(palabras[i:i + tamano]) for i in range(max(1, len(palabras) - tamano + 1))}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) & _PRIMO for s in shingles),
+                         dtype=np.uint64, count=len(shingles))
+    # h_i(x) = (a_i * x + b_i) mod p, sin desbordar uint64 (a, x < 2^31)
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIMO).min(axis=1)
+
+
+def jaccard_estimada(firma_a, firma_b):
+    return float(np.mean(firma_a == firma_b))
+
+
+# ============================================================
+# Clustering
+# ============================================================
+def _raiz(padres, i):
+    while padres[i] != i:
+        padres[i] = padres[padres[i]]
+        i = padres[i]
+    return i
+
+
+def agrupar_duplicados(textos, umbral=UMBRAL_JACCARD):
+    """
+    Devuelve los clusters de índices de textos casi duplicados (solo los de 2 o más).
+    """
+    firmas = [firma_minhash(t) for t in textos]
+    filas = NUM_PERMUTACIONES // BANDAS
+    padres = list(range(len(textos)))
+
+    for banda in range(BANDAS):
+        cubetas = {}
+        for i, firma in enumerate(firmas):
+            clave = firma[banda * filas:(banda + 1) * filas].tobytes()
+            cubetas.setdefault(clave, []).append(i)
+        for miembros in cubetas.values():
+            for posicion, otro in enumerate(miembros[1:], start=1):
+                for previo in miembros[:posicion]:
+                    if _raiz(padres, previo) == _raiz(padres, otro):
+                        break
+                    if jaccard_estimada(firmas[previo], firmas[otro]) >= umbral:
+                        padres[_raiz(padres, otro)] = _raiz(padres, previo)
+                        break
+
+    clusters = {}
+    for i in range(len(textos)):
+        clusters.setdefault(_raiz(padres, i), []).append(i)
+    return [sorted(c) for c in clusters.values() if len(c) > 1]
+
+
+def _fuente(metadata):
+    return {campo: metadata[campo] for campo in CAMPOS_FUENTE if campo in metadata}
+
+
+def fuentes_de(metadata):
+    """Fuentes de un fragmento: las fusionadas si las tiene, o la suya propia."""
+    if FUENTES_FUSIONADAS in metadata:
+        try:
+            return json.loads(metadata[FUENTES_FUSIONADAS])
+        except ValueError:
+            pass
+    return [_fuente(metadata)]
+
+
+def fusionar_metadatos(canonico, otros):
+    """Metadatos del canónico + lista JSON con la fuente de cada fragmento del cluster."""
+    fuentes = []
+    for metadata in [canonico] + list(otros):
+        for fuente in fuentes_de(metadata):
+            if fuente not in fuentes:
+                fuentes.append(fuente)
+    fusionado = dict(canonico)
+    fusionado[FUENTES_FUSIONADAS] = json.dumps(fuentes, ensure_ascii=False)
+    return fusionado
+
+
+def deduplicar(textos, metadatos, umbral=UMBRAL_JACCARD):
+    """
+    Elige una copia canónica por cluster de casi duplicados.
+
+    Devuelve (conservados, metadatos_finales, reporte):
+    - conservados: índices de los textos que se indexan, en el orden original
+    - metadatos_finales: {indice: metadata} con las fuentes fusionadas de cada canónico
+    - reporte: dict con totales para imprimir con `resumen_reporte`
+    """
+    clusters = agrupar_duplicados(textos, umbral)
+    descartados = set()
+    metadatos_finales = {}
+    for cluster in clusters:
+        # La copia más larga suele ser la más completa
+        canonico = max(cluster, key=lambda i: (len(textos[i]), -i))
+        otros = [i for i in cluster if i != canonico]
+        metadatos_finales[canonico] = fusionar_metadatos(metadatos[canonico], [metadatos[i] for i in otros])
+        descartados.update(otros)
+
+    conservados = [i for i in range(len(textos)) if i not in descartados]
+    caracteres = sum(len(textos[i]) for i in descartados)
+    reporte = {
+        "fragmentos": len(textos),
+        "conservados": len(conservados),
+        "clusters": len(clusters),
+        "descartados": len(descartados),
+        "caracteres_ahorrados": caracteres,
+        # Estimación habitual de ~4 caracteres por token
+        "tokens_ahorrados": caracteres // 4,
+    }
+    return conservados, metadatos_finales, reporte
+
+
+def deduplicar_documentos(docs, umbral=UMBRAL_JACCARD):
+    """Versión para Documents de LangChain: devuelve (docs_canonicos, reporte)."""
+    conservados, metadatos_finales, reporte = deduplicar(
+        [d.page_content for d in docs], [d.metadata for d in docs], umbral)
+    resultado = []
+    for i in conservados:
+        doc = docs[i]
+        if i in metadatos_finales:
+            doc = doc.__class__(page_content=doc.page_content, metadata=metadatos_finales[i])
+        resultado.append(doc)
+    return resultado, reporte
+
+
+def resumen_reporte(reporte):
+    if not reporte["fragmentos"]:
+        return "Deduplicación: sin fragmentos."
+    porcentaje = 100 * reporte["descartados"] / reporte["fragmentos"]
+    return (f"Deduplicación: {reporte['fragmentos']} → {reporte['conservados']} fragmentos "
+            f"({reporte['descartados']} casi duplicados en {reporte['clusters']} clusters, {porcentaje:.1f}%) | "
+            f"ahorro ≈ {reporte['caracteres_ahorrados']} caracteres, ~{reporte['tokens_ahorrados']} tokens "
+            f"y {reporte['descartados']} embeddings")
@@ -0,0 +1,252 @@
+from bs4 import BeautifulSoup
+
+# lxml es opcional: si no está instalado se usa BeautifulSoup como antes
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+# Secciones del listado principal: clase CSS del contenedor -> nivel académico
+SECCIONES = {'grado': 'Grado', 'posgrado': 'Posgrado', 'tecnologia': 'Tecnologías'}
+
+# ============================================================
+# Parseo Estructurado (La lógica V3 "Clave-Valor")
+# ============================================================
+def parsear_detalle_estructurado(soup):
+    """
+    Extrae la información en formato diccionario buscando pares Label-Valor
+    típicos de Drupal/UTPL.
+    """
+    detalles = {}
+    
+    # Buscamos el contenedor principal
+    region = soup.find('div', class_='region-content') or soup.find('div', class_='content')
+    if not region:
+        return {"Nota": "No se detectó el contenedor principal de contenido."}
+
+    # Estrategia A: Buscar estructura de campos 'field'
+    campos = region.find_all('div', class_=lambda x: x and 'field' in x.split())
+    
+    found_structure = False
+    for campo in campos:
+        etiqueta_div = campo.find('div', class_='field-label')
+        items_div = campo.find('div', class_='field-items')
+        
+        if etiqueta_div and items_div:
+            key = etiqueta_div.get_text(strip=True).rstrip(':')
+            # Mantenemos saltos de línea para listas dentro de los valores
+            value = items_div.get_text(separator='\n', strip=True)
+            detalles[key] = value
+            found_structure = True
+
+    # Estrategia B: Tablas HTML
+    if not found_structure:
+        filas = region.find_all('tr')
+        for fila in filas:
+            cols = fila.find_all(['td', 'th'])
+            if len(cols) >= 2:
+                key = cols[0].get_text(strip=True).rstrip(':')
+                val = cols[1].get_text(separator='\n', strip=True)
+                detalles[key] = val
+                found_structure = True
+
+    # Estrategia C: Fallback a texto plano si falla la estructura
+    if not found_structure:
+        return {"Información General": region.get_text(separator='\n', strip=True)}
+        
+    return detalles
+
+
+# ============================================================
+# Interfaz común de los parsers de páginas de becas
+# ============================================================
+class ParserBecas:
+    """
+    Backend de parseo para las páginas de becas.utpl.edu.ec.
+
+    Métodos:
+    - parsear_listado(html, secciones): {clase_seccion: [{"titulo", "href", "clases"}]}
+    - parsear_detalle(html): diccionario clave-valor de la página de detalle
+    """
+    nombre = "base"
+
+    def parsear_listado(self, html, secciones):
+        raise NotImplementedError
+
+    def parsear_detalle(self, html):
+        raise NotImplementedError
+
+
+# ============================================================
+# Backend de referencia: BeautifulSoup (html.parser)
+# ============================================================
+class ParserBeautifulSoup(ParserBecas):
+    """Implementación original: construye el árbol completo con html.parser."""
+    nombre = "bs4"
+
+    def parsear_listado(self, html, secciones):
+        soup = BeautifulSoup(html, 'html.parser')
+        listado = {}
+
+        for clase_sec in secciones:
+            contenedor = soup.find('div', class_=clase_sec)
+            if not contenedor: continue
+
+            entradas = []
+            for item in contenedor.find_all('div', class_='item'):
+                enlace = item.find('a')
+                if enlace:
+                    entradas.append({
+                        "titulo": enlace.get_text(strip=True),
+                        "href": enlace.get('href'),
+                        "clases": item.get('class', []),
+                    })
+            listado[clase_sec] = entradas
+
+        return listado
+
+    def parsear_detalle(self, html):
+        return parsear_detalle_estructurado(BeautifulSoup(html, 'html.parser'))
+
+
+# ============================================================
+# Backend rápido: lxml limitado al subárbol 'region-content'
+# ============================================================
+# Etiquetas cuyo texto BeautifulSoup excluye de get_text()
+_SIN_TEXTO = {'script', 'style', 'template'}
+
+
+def _xpath_clase(etiqueta, clase):
+    """XPath equivalente a find(etiqueta, class_=clase) de BeautifulSoup."""
+    return (f".//{etiqueta}[contains(concat(' ', normalize-space(@class), ' '), "
+            f"' {clase} ')]")
+
+
+def _fragmentos_texto(elemento):
+    """Recorre los nodos de texto en orden de documento (como _all_strings de bs4)."""
+    if isinstance(elemento.tag, str) and elemento.tag not in _SIN_TEXTO:
+        if elemento.text:
+            yield elemento.text
+        for hijo in elemento:
+            yield from _fragmentos_texto(hijo)
+            if hijo.tail:
+                yield hijo.tail
+
+
+def _texto(elemento, separador=''):
+    """Equivalente a get_text(separator=separador, strip=True) de BeautifulSoup."""
+    return separador.join(
+        t.strip() for t in _fragmentos_texto(elemento) if t.strip()
+    )
+
+
+class ParserLxml(ParserBecas):
+    """
+    Parser en C (lxml) con búsquedas XPath en lugar de lambdas de clase.
+    Todo el recorrido de la página de detalle se limita al contenedor
+    'region-content' (o 'content'); el resto del documento no se visita.
+    """
+    nombre = "lxml"
+
+    def __init__(self):
+        if lxml is None:
+            raise ImportError("lxml no está instalado: pip install lxml")
+        self._region = etree.XPath(_xpath_clase('div', 'region-content'))
+        self._content = etree.XPath(_xpath_clase('div', 'content'))
+        self._campos = etree.XPath(_xpath_clase('div', 'field'))
+        self._etiqueta = etree.XPath(_xpath_clase('div', 'field-label'))
+        self._items = etree.XPath(_xpath_clase('div', 'field-items'))
+        self._item_listado = etree.XPath(_xpath_clase('div', 'item'))
+
+    def _documento(self, html):
+        """Árbol del documento, o None si no hay contenido (html vacío o solo espacios)."""
+        try:
+            try:
+                return lxml.html.document_fromstring(html)
+            except ValueError:
+                # lxml rechaza str con declaración de codificación XML
+                return lxml.html.document_fromstring(html.encode('utf-8'))
+        except etree.ParserError:
+            # "Document is empty": BeautifulSoup devuelve un árbol vacío en este caso
+            return None
+
+    def parsear_listado(self, html, secciones):
+        doc = self._documento(html)
+        listado = {}
+        if doc is None:
+            return listado
+
+        for clase_sec in secciones:
+            contenedores = doc.xpath(_xpath_clase('div', clase_sec))
+            if not contenedores: continue
+
+            entradas = []
+            for item in self._item_listado(contenedores[0]):
+                enlace = next(item.iter('a'), None)
+                if enlace is not None:
+                    entradas.append({
+                        "titulo": _texto(enlace),
+                        "href": enlace.get('href'),
+                        "clases": item.get('class', '').split(),
+                    })
+            listado[clase_sec] = entradas
+
+        return listado
+
+    def parsear_detalle(self, html):
+        doc = self._documento(html)
+        detalles = {}
+
+        # Buscamos el contenedor principal
+        regiones = (self._region(doc) or self._content(doc)) if doc is not None else []
+        if not regiones:
+            return {"Nota": "No se detectó el contenedor principal de contenido."}
+        region = regiones[0]
+
+        # Estrategia A: campos 'field' (Drupal)
+        found_structure = False
+        for campo in self._campos(region):
+            etiquetas = self._etiqueta(campo)
+            items = self._items(campo)
+
+            if etiquetas and items:
+                key = _texto(etiquetas[0]).rstrip(':')
+                detalles[key] = _texto(items[0], '\n')
+                found_structure = True
+
+        # Estrategia B: tablas HTML
+        if not found_structure:
+            for fila in region.iter('tr'):
+                cols = list(fila.iterdescendants('td', 'th'))
+                if len(cols) >= 2:
+                    key = _texto(cols[0]).rstrip(':')
+                    detalles[key] = _texto(cols[1], '\n')
+                    found_structure = True
+
+        # Estrategia C: texto plano
+        if not found_structure:
+            return {"Información General": _texto(region, '\n')}
+
+        return detalles
+
+
+# ============================================================
+# Selección del backend
+# ============================================================
+PARSERS = {
+    ParserBeautifulSoup.nombre: ParserBeautifulSoup,
+    ParserLxml.nombre: ParserLxml,
+}
+
+
+def get_parser(nombre=None):
+    """
+    Devuelve una instancia del parser solicitado ('lxml' o 'bs4').
+    Sin nombre, usa lxml si está disponible y BeautifulSoup en caso contrario.
+    """
+    if nombre is None:
+        nombre = "lxml" if lxml is not None else "bs4"
+    if nombre not in PARSERS:
+        raise ValueError(f"Parser desconocido: {nombre}. Opciones: {', '.join(PARSERS)}")
+    return PARSERS[nombre]()
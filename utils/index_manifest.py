@@ -0,0 +1,222 @@
+import os
+import json
+import shutil
+import hashlib
+import tarfile
+import tempfile
+from datetime import datetime, timezone
+
+# ============================================================
+# Manifiesto del índice vectorial
+# ============================================================
+# El manifiesto se guarda junto al índice y describe con qué se construyó:
+# fuentes (con hash), configuración del chunker y del modelo de embeddings.
+# Si coincide con el estado actual, el índice en disco está vigente.
+ARCHIVO_MANIFEST = "index_manifest.json"
+VERSION_MANIFEST = 1
+
+# Caché de hashes por (ruta, tamaño, mtime) para no releer archivos sin cambios
+_cache_hashes = {}
+
+
+def hash_archivo(ruta):
+    """SHA-256 del archivo, reutilizando el resultado si no cambió tamaño ni mtime."""
+    estado = os.stat(ruta)
+    clave = (os.path.abspath(ruta), estado.st_size, estado.st_mtime_ns)
+    if clave not in _cache_hashes:
+        sha = hashlib.sha256()
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(bloque)
+        _cache_hashes[clave] = sha.hexdigest()
+    return _cache_hashes[clave]
+
+
+def construir_manifest(fuentes, configuracion):
+    """
+    Crea el manifiesto del estado actual.
+
+    Parámetros:
+    - fuentes (list): rutas de los archivos que alimentan el índice (las inexistentes se omiten)
+    - configuracion (dict): {"backend", "chunker", "embedding"} usados para construirlo
+      y, si el backend comprime los vectores, "encoding"
+    Al publicarlo, el backend agrega dónde quedó el índice: "collection" (Chroma)
+    o "directory" (NumPy).
+    """
+    return {
+        "version": VERSION_MANIFEST,
+        **configuracion,
+        "sources": [
+            {"path": ruta, "sha256": hash_archivo(ruta), "bytes": os.path.getsize(ruta)}
+            for ruta in sorted(set(fuentes)) if os.path.isfile(ruta)
+        ],
+        "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+# Datos de cada construcción que no cambian el contenido del índice
+CLAVES_CONSTRUCCION = ("built_at", "collection", "directory")
+
+
+def _contenido(manifest):
+    """Parte comparable del manifiesto (sin la fecha ni la ubicación de la construcción)."""
+    return {k: v for k, v in manifest.items() if k not in CLAVES_CONSTRUCCION}
+
+
+def huella_manifest(manifest):
+    """Identificador estable del contenido del índice (hash del manifiesto sin los datos de la construcción)."""
+    canonico = json.dumps(_contenido(manifest), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonico.encode("utf-8")).hexdigest()[:16]
+
+
+def leer_manifest(persist_dir):
+    ruta = os.path.join(persist_dir, ARCHIVO_MANIFEST)
+    if not os.path.exists(ruta):
+        return None
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Manifiesto ilegible en {ruta}: {e}")
+        return None
+
+
+def guardar_manifest(persist_dir, manifest):
+    os.makedirs(persist_dir, exist_ok=True)
+    ruta = os.path.join(persist_dir, ARCHIVO_MANIFEST)
+    # Temporal con nombre único: dos procesos que publican a la vez no se pisan
+    descriptor, temporal = tempfile.mkstemp(prefix=ARCHIVO_MANIFEST + ".", suffix=".tmp", dir=persist_dir)
+    try:
+        with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(temporal, ruta)
+    except BaseException:
+        os.remove(temporal)
+        raise
+
+
+# Claves del chunker que un índice puede no tener sin dejar de estar vigente.
+# Los índices construidos antes de la deduplicación (o con ingest --no-dedupe)
+# están completos (solo tienen copias de más), así que no obligan a regenerar:
+# la deduplicación se aplica en la próxima construcción, que por defecto la
+# hace tanto en la app como en la ingesta. Si el valor guardado existe y es
+# distinto, sí se regenera.
+CLAVES_OPCIONALES_CHUNKER = ("dedupe",)
+
+
+def _chunker_comparable(guardado, actual):
+    chunker = dict(guardado or {})
+    for clave in CLAVES_OPCIONALES_CHUNKER:
+        if clave not in chunker and isinstance(actual, dict):
+            chunker[clave] = actual.get(clave)
+    return chunker
+
+
+def motivo_desactualizado(persist_dir, manifest_actual):
+    """
+    Compara el manifiesto guardado con el estado actual.
+    Devuelve None si el índice está vigente, o un texto con el motivo si no.
+    Las claves ausentes de CLAVES_OPCIONALES_CHUNKER toman el valor actual.
+    """
+    guardado = leer_manifest(persist_dir)
+    if guardado is None:
+        return "el índice no tiene manifiesto"
+    if guardado.get("version") != manifest_actual["version"]:
+        return "cambió la versión del manifiesto"
+
+    for clave in ("backend", "encoding", "chunker", "embedding"):
+        anterior = guardado.get(clave)
+        if clave == "chunker":
+            anterior = _chunker_comparable(anterior, manifest_actual.get(clave))
+        if anterior != manifest_actual.get(clave):
+            return f"cambió la configuración de '{clave}'"
+
+    anteriores = {s["path"]: s["sha256"] for s in guardado.get("sources", [])}
+    actuales = {s["path"]: s["sha256"] for s in manifest_actual["sources"]}
+    for ruta in sorted(set(anteriores) | set(actuales)):
+        if ruta not in anteriores:
+            return f"fuente nueva: {ruta}"
+        if ruta not in actuales:
+            return f"fuente eliminada: {ruta}"
+        if anteriores[ruta] != actuales[ruta]:
+            return f"fuente modificada: {ruta}"
+    return None
+
+
+# ============================================================
+# Snapshots del índice (exportar / importar)
+# ============================================================
+def exportar_snapshot(persist_dir, destino):
+    """Empaqueta el índice y su manifiesto en un .tar.gz listo para copiar a un contenedor."""
+    if leer_manifest(persist_dir) is None:
+        raise ValueError(f"'{persist_dir}' no tiene manifiesto; regenera el índice antes de exportarlo.")
+    with tarfile.open(destino, "w:gz") as tar:
+        tar.add(persist_dir, arcname="index")
+    print(f"Snapshot exportado en {destino}")
+    return destino
+
+
+def importar_snapshot(origen, persist_dir):
+    """
+    Restaura un snapshot en persist_dir reemplazando el índice actual.
+    La extracción ocurre en un directorio temporal y solo se reemplaza si es válida.
+    """
+    padre = os.path.dirname(os.path.abspath(persist_dir))
+    with tempfile.TemporaryDirectory(dir=padre) as temporal:
+        with tarfile.open(origen, "r:gz") as tar:
+            for miembro in tar.getmembers():
+                ruta = os.path.normpath(miembro.name)
+                if os.path.isabs(ruta) or ruta.startswith(".."):
+                    raise ValueError(f"Ruta no permitida en el snapshot: {miembro.name}")
+            if hasattr(tarfile, "data_filter"):
+                tar.extractall(temporal, filter="data")
+            else:
+                tar.extractall(temporal)
+
+        extraido = os.path.join(temporal, "index")
+        manifest = leer_manifest(extraido)
+        if manifest is None:
+            raise ValueError("El snapshot no contiene un manifiesto de índice válido.")
+
+        respaldo = None
+        if os.path.exists(persist_dir):
+            respaldo = os.path.join(temporal, "anterior")
+            os.replace(persist_dir, respaldo)
+        try:
+            shutil.move(extraido, persist_dir)
+        except Exception:
+            if respaldo:
+                os.replace(respaldo, persist_dir)
+            raise
+
+    print(f"Snapshot importado en {persist_dir} (construido el {manifest.get('built_at')})")
+    return manifest
+
+
+# ============================================================
+# Ejecución directa
+# ============================================================
+if __name__ == "__main__":
+    import argparse
+    from utils.prepare_vectordb import manifest_actual
+    from utils.vector_store import get_backend
+
+    parser = argparse.ArgumentParser(description="Estado y snapshots del índice vectorial.")
+    parser.add_argument("accion", choices=["status", "export", "import"])
+    parser.add_argument("archivo", nargs="?", help="Ruta del snapshot .tar.gz (export/import)")
+    parser.add_argument("--backend", help="'chroma' o 'numpy' (por defecto BECABOT_VECTOR_BACKEND)")
+    args = parser.parse_args()
+
+    backend = get_backend(args.backend)
+
+    if args.accion == "status":
+        pdfs = os.listdir("docs") if os.path.exists("docs") else []
+        motivo = motivo_desactualizado(backend.persist_dir,
+                                       manifest_actual(pdfs, backend.nombre, backend.codificacion))
+        print(f"Índice '{backend.persist_dir}': " + ("vigente" if motivo is None else f"desactualizado ({motivo})"))
+    elif not args.archivo:
+        parser.error("export/import requieren la ruta del snapshot")
+    elif args.accion == "export":
+        exportar_snapshot(backend.persist_dir, args.archivo)
+    else:
+        importar_snapshot(args.archivo, backend.persist_dir)
@@ -0,0 +1,774 @@
+import os
+import json
+import time
+import queue
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timezone
+from langchain_community.document_loaders import PyPDFLoader
+from langchain.docstore.document import Document
+from utils.dedupe import deduplicar, dedupe_habilitado, resumen_reporte
+from utils.html_parsers import get_parser
+from utils.index_manifest import hash_archivo, leer_manifest
+from utils.prepare_vectordb import (
+    CHUNK_OVERLAP, CHUNK_SIZE, CORPUS_JSON, EMBEDDING_MODEL, SEPARADORES,
+    documento_beca, get_embedding_model, get_text_chunks, manifest_actual,
+)
+from utils.vector_store import get_backend
+from utils.web_scraper import configurar_driver, descargar_pagina, obtener_listado
+
+# ============================================================
+# Ingesta por lotes: scrape → parse → normalize → chunk → dedupe → embed → upsert
+# ============================================================
+# Cada etapa corre en sus propios hilos y se conecta con la siguiente por
+# una cola acotada, así que las etapas se solapan (mientras se descarga una
+# página, otra ya se está embebiendo). Después de cada etapa el resultado
+# de cada ítem se guarda como checkpoint, de modo que una ejecución fallida
+# se reanuda sin repetir el trabajo hecho.
+#
+# Las escrituras van a una copia de preparación del índice (colección Chroma
+# nueva o matriz NumPy en memoria) que parte del índice vigente y solo se
+# publica al terminar; mientras tanto la app sigue usando el índice vigente.
+# Un ítem que falla (p. ej. un PDF corrupto) no bloquea la publicación:
+# conserva sus fragmentos y su entrada del corpus anteriores, y se reintenta
+# en la próxima ejecución. Si fallan más ítems que --max-error-rate, no se
+# publica nada y la próxima ejecución reanuda desde los checkpoints.
+#
+# La deduplicación sigue a BECABOT_DEDUPE, igual que la regeneración de la
+# app, para que ambos caminos construyan el mismo índice. Convierte la etapa
+# dedupe en una barrera: necesita los fragmentos de todos los ítems para
+# fusionar los casi duplicados entre el manual PDF y la web, así que solo
+# libera los ítems hacia embed cuando termina la etapa chunk. Con
+# --no-dedupe la etapa deja pasar cada ítem en cuanto llega y las etapas se
+# solapan por completo.
+#
+# Uso (trabajo nocturno):
+#     python -m utils.ingest --only-changed
+#     python -m utils.ingest --dry-run
+#     python -m utils.ingest --workers scrape=3 --workers embed=2 --backend numpy
+#     python -m utils.ingest --only-changed --warm-cache   # + cachés de preguntas frecuentes
+#     python -m utils.ingest --no-dedupe                   # sin fusionar casi duplicados (más solapamiento)
+ETAPAS = ["scrape", "parse", "normalize", "chunk", "dedupe", "embed", "upsert"]
+HILOS_DEFAULT = {"scrape": 2, "parse": 2, "normalize": 1, "chunk": 2, "dedupe": 1, "embed": 1, "upsert": 1}
+CHECKPOINT_DIR = "knowledge_base/ingest_checkpoints"
+MAX_TASA_ERRORES = 0.1
+
+_FIN = object()
+
+
+def _hash(datos):
+    texto = json.dumps(datos, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()[:16]
+
+
+def _docs_a_json(docs):
+    return [{"page_content": d.page_content, "metadata": d.metadata} for d in docs]
+
+
+def _json_a_docs(datos):
+    return [Document(page_content=d["page_content"], metadata=d["metadata"]) for d in datos]
+
+
+# ============================================================
+# Checkpoints en disco
+# ============================================================
+class Checkpoints:
+    """
+    Resultados intermedios por etapa, direccionados por contenido.
+
+    En disco (directorio):
+    ├── <etapa>/<hash del ítem>/<hash de la clave>.json: salida de la etapa para un ítem
+    ├── <etapa>/<hash de la clave>.json: etapas por ejecución (scrape, listado)
+    ├── estado.json: ejecución en curso (para reanudar) y si terminó
+    └── registro_<backend>.json: ítems y ids de fragmentos ya escritos en el índice
+    """
+
+    def __init__(self, directorio, habilitado=True):
+        self.directorio = directorio
+        self.habilitado = habilitado
+        self.usados = set()     # rutas leídas o escritas en esta ejecución
+
+    @staticmethod
+    def _carpeta_item(item_id):
+        return hashlib.sha1(item_id.encode("utf-8")).hexdigest()[:16]
+
+    def _ruta(self, etapa, clave, item_id=None):
+        nombre = hashlib.sha1(clave.encode("utf-8")).hexdigest() + ".json"
+        if item_id is None:
+            return os.path.join(self.directorio, etapa, nombre)
+        return os.path.join(self.directorio, etapa, self._carpeta_item(item_id), nombre)
+
+    def _leer_json(self, ruta):
+        if not os.path.exists(ruta):
+            return None
+        try:
+            with open(ruta, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _guardar_json(self, ruta, datos):
+        if not self.habilitado:
+            return
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(datos, f, ensure_ascii=False)
+        os.replace(ruta + ".tmp", ruta)
+
+    def leer(self, etapa, clave, item_id=None):
+        ruta = self._ruta(etapa, clave, item_id)
+        datos = self._leer_json(ruta)
+        if datos is not None:
+            self.usados.add(ruta)
+        return datos
+
+    def guardar(self, etapa, clave, datos, item_id=None):
+        ruta = self._ruta(etapa, clave, item_id)
+        self.usados.add(ruta)
+        self._guardar_json(ruta, datos)
+
+    def podar(self, etapa, item_ids):
+        """
+        Elimina los checkpoints de ítems que ya no están en las fuentes y, de los
+        ítems que pasaron por la etapa en esta ejecución, las versiones anteriores.
+        Devuelve la cantidad de archivos borrados.
+        """
+        carpeta = os.path.join(self.directorio, etapa)
+        if not self.habilitado or not os.path.isdir(carpeta):
+            return 0
+        vivos = {self._carpeta_item(i) for i in item_ids}
+        borrados = 0
+        for nombre in os.listdir(carpeta):
+            ruta = os.path.join(carpeta, nombre)
+            if not os.path.isdir(ruta):
+                # Formato anterior, sin carpeta por ítem: ya no se vuelve a leer
+                os.remove(ruta)
+                borrados += 1
+                continue
+            archivos = [os.path.join(ruta, a) for a in os.listdir(ruta)]
+            if nombre not in vivos:
+                obsoletos = archivos
+            elif any(a in self.usados for a in archivos):
+                obsoletos = [a for a in archivos if a not in self.usados]
+            else:
+                continue
+            for archivo in obsoletos:
+                os.remove(archivo)
+            borrados += len(obsoletos)
+            if len(obsoletos) == len(archivos):
+                os.rmdir(ruta)
+        return borrados
+
+    def limpiar_etapa(self, etapa):
+        carpeta = os.path.join(self.directorio, etapa)
+        if self.habilitado and os.path.isdir(carpeta):
+            for archivo in os.listdir(carpeta):
+                os.remove(os.path.join(carpeta, archivo))
+
+    def leer_estado(self):
+        return self._leer_json(os.path.join(self.directorio, "estado.json"))
+
+    def guardar_estado(self, estado):
+        self._guardar_json(os.path.join(self.directorio, "estado.json"), estado)
+
+    def leer_registro(self, backend):
+        return self._leer_json(os.path.join(self.directorio, f"registro_{backend}.json"))
+
+    def guardar_registro(self, backend, registro):
+        self._guardar_json(os.path.join(self.directorio, f"registro_{backend}.json"), registro)
+
+
+# ============================================================
+# Etapas conectadas por colas acotadas
+# ============================================================
+class EstadisticasEtapa:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.procesados = 0
+        self.reutilizados = 0   # resultado tomado de un checkpoint
+        self.omitidos = 0       # descartados a propósito (--only-changed, --dry-run)
+        self.errores = 0
+        self.segundos = 0.0
+
+    def sumar(self, campo, cantidad=1):
+        with self.lock:
+            setattr(self, campo, getattr(self, campo) + cantidad)
+
+
+class Etapa:
+    """
+    Ejecuta `funcion(item)` en `hilos` hilos leyendo de `entrada` y escribiendo
+    en `salida`. Si la función devuelve None, el ítem no continúa.
+    `al_terminar()`, si se indica, se llama al agotarse la entrada y los ítems
+    que devuelve se envían antes del fin (etapas que trabajan por lote).
+    `al_fallar(item_id)`, si se indica, se llama por cada ítem que falla.
+    """
+
+    def __init__(self, nombre, funcion, hilos, entrada, salida, stats, al_terminar=None, al_fallar=None):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.al_terminar = al_terminar
+        self.al_fallar = al_fallar
+        self.entrada = entrada
+        self.salida = salida
+        self.stats = stats
+        self._activos = hilos
+        self._lock = threading.Lock()
+        self._hilos = [
+            threading.Thread(target=self._trabajar, name=f"ingesta-{nombre}-{i}", daemon=True)
+            for i in range(hilos)
+        ]
+
+    def iniciar(self):
+        for hilo in self._hilos:
+            hilo.start()
+
+    def esperar(self):
+        for hilo in self._hilos:
+            hilo.join()
+
+    def _trabajar(self):
+        while True:
+            item = self.entrada.get()
+            if item is _FIN:
+                # Reenviar el fin a los hilos hermanos; el último avisa a la siguiente etapa
+                self.entrada.put(_FIN)
+                with self._lock:
+                    self._activos -= 1
+                    ultimo = self._activos == 0
+                if ultimo:
+                    self._terminar()
+                return
+
+            inicio = time.perf_counter()
+            try:
+                resultado = self.funcion(item)
+                self.stats.sumar("procesados")
+            except Exception as e:
+                print(f"   ⚠️ [{self.nombre}] Error en {item.get('id')}: {e}")
+                self.stats.sumar("errores")
+                if self.al_fallar is not None:
+                    self.al_fallar(item.get("id"))
+                resultado = None
+            self.stats.sumar("segundos", time.perf_counter() - inicio)
+
+            if resultado is not None and self.salida is not None:
+                self.salida.put(resultado)
+
+    def _terminar(self):
+        if self.al_terminar is not None:
+            inicio = time.perf_counter()
+            try:
+                for resultado in self.al_terminar():
+                    if self.salida is not None:
+                        self.salida.put(resultado)
+            except Exception as e:
+                print(f"   ⚠️ [{self.nombre}] Error al cerrar el lote: {e}")
+                self.stats.sumar("errores")
+            self.stats.sumar("segundos", time.perf_counter() - inicio)
+        if self.salida is not None:
+            self.salida.put(_FIN)
+
+
+# ============================================================
+# Ingesta
+# ============================================================
+class Ingesta:
+    """
+    Orquesta una ejecución completa de la ingesta.
+
+    Ítems que recorren las etapas (dicts):
+    ├── web: {"id": "web:<nivel>:<url>", "tipo": "web", "beca": {...}}
+    └── pdf: {"id": "pdf:<nombre>", "tipo": "pdf", "ruta": "docs/<nombre>"}
+
+    Una misma beca puede aparecer en varias secciones del listado (Grado,
+    Posgrado...): cada aparición es un ítem propio, como en el corpus JSON
+    del scraper original. La página se descarga una sola vez por ejecución.
+
+    Todo se escribe en una copia de preparación del índice que se publica
+    (manifiesto nuevo) al terminar; los ítems con error conservan su versión
+    anterior, salvo que superen la tasa máxima de errores.
+    """
+
+    def __init__(self, args):
+        self.backend = get_backend(args.backend)
+        self.parser_html = get_parser(args.parser)
+        self.solo_cambios = args.only_changed
+        self.dry_run = args.dry_run
+        self.sin_scraping = args.no_scrape
+        self.reiniciar_ejecucion = args.restart
+        self.max_tasa_errores = args.max_error_rate
+        self.tam_cola = args.queue_size
+        self.hilos = dict(HILOS_DEFAULT)
+        self.hilos.update(args.workers or {})
+        self.hilos["upsert"] = 1  # un único escritor sobre el índice
+        self.hilos["dedupe"] = 1  # barrera: agrupa los fragmentos de todos los ítems (salvo --no-dedupe)
+        self.dedupe = dedupe_habilitado() and not args.no_dedupe
+        self.lote_dedupe = []
+        self.reporte_dedupe = None
+
+        self.checkpoints = Checkpoints(args.checkpoint_dir, habilitado=not self.dry_run)
+        self.stats = {etapa: EstadisticasEtapa() for etapa in ETAPAS}
+        self.config_chunker = {"chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP, "separators": SEPARADORES}
+
+        self.run_id = None
+        self.embedding = None
+        self.escritor = None
+        self.registro = {}
+        self.lock = threading.Lock()
+        self.vistos = set()
+        self.fallidos = set()
+        self.becas = {}
+        self.orden_becas = []
+        self.listado_completo = True
+        self.cambios = {"nuevos": [], "modificados": [], "sin_cambios": []}
+
+        self._local = threading.local()
+        self._drivers = []
+
+    # --------------------------------------------------------
+    # Preparación
+    # --------------------------------------------------------
+    def _preparar_ejecucion(self):
+        """Reanuda la ejecución incompleta anterior o inicia una nueva."""
+        estado = self.checkpoints.leer_estado()
+        if estado and not estado.get("completado") and not self.reiniciar_ejecucion:
+            self.run_id = estado["run_id"]
+            print(f"Reanudando ejecución incompleta {self.run_id} desde sus checkpoints.")
+        else:
+            self.run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+            self.checkpoints.limpiar_etapa("scrape")
+            self.checkpoints.limpiar_etapa("listado")
+            print(f"Nueva ejecución de ingesta {self.run_id}.")
+        self.checkpoints.guardar_estado({"run_id": self.run_id, "completado": False})
+
+    def _preparar_indice(self):
+        """
+        El registro solo es válido si el índice actual lo construyó la ingesta
+        (mismo built_at en el manifiesto). Si no, se reconstruye desde cero.
+        """
+        registro = self.checkpoints.leer_registro(self.backend.nombre) or {}
+        manifest = leer_manifest(self.backend.persist_dir) if self.backend.existe() else None
+        valido = manifest is not None and registro.get("built_at") == manifest.get("built_at")
+        self.registro = registro.get("items", {}) if valido else {}
+
+        if self.dry_run:
+            return
+        if not valido:
+            print("El índice actual no proviene de la ingesta: se reconstruirá completo "
+                  "(el vigente sigue atendiendo consultas hasta publicar el nuevo).")
+        self.escritor = self.backend.abrir_escritura(desde_cero=not valido)
+
+    def _driver(self):
+        """Un navegador por hilo de scraping."""
+        if not hasattr(self._local, "driver"):
+            self._local.driver = configurar_driver()
+            with self.lock:
+                self._drivers.append(self._local.driver)
+        return self._local.driver
+
+    # --------------------------------------------------------
+    # Fuentes
+    # --------------------------------------------------------
+    def _listado_becas(self):
+        if self.sin_scraping:
+            if not os.path.exists(CORPUS_JSON):
+                print(f"⚠️ --no-scrape sin corpus en {CORPUS_JSON}.")
+                self.listado_completo = False
+                return []
+            with open(CORPUS_JSON, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        guardado = self.checkpoints.leer("listado", self.run_id)
+        if guardado is not None:
+            return guardado
+        try:
+            becas = obtener_listado(self._driver(), self.parser_html)
+        except Exception as e:
+            print(f"❌ No se pudo obtener el listado de becas: {e}")
+            self.listado_completo = False
+            return []
+        self.checkpoints.guardar("listado", self.run_id, becas)
+        return becas
+
+    def _fuentes(self):
+        for beca in self._listado_becas():
+            item_id = f"web:{beca['nivel']}:{beca['url']}"
+            self.orden_becas.append(item_id)
+            yield {"id": item_id, "tipo": "web", "beca": beca}
+
+        if os.path.exists("docs"):
+            for nombre in sorted(os.listdir("docs")):
+                if nombre.endswith(".pdf"):
+                    yield {"id": f"pdf:{nombre}", "tipo": "pdf", "ruta": os.path.join("docs", nombre)}
+
+    # --------------------------------------------------------
+    # Funciones de cada etapa
+    # --------------------------------------------------------
+    def _scrape(self, item):
+        if item["tipo"] == "pdf":
+            item["hash_fuente"] = hash_archivo(item["ruta"])
+            return item
+        if self.sin_scraping:
+            return item
+
+        # Clave por URL: la misma beca listada en otra sección reutiliza la descarga
+        clave = f"{self.run_id}:{item['beca']['url']}"
+        guardado = self.checkpoints.leer("scrape", clave)
+        if guardado is not None:
+            self.stats["scrape"].sumar("reutilizados")
+            item["html"] = guardado["html"]
+        else:
+            item["html"] = descargar_pagina(self._driver(), item["beca"]["url"])
+            self.checkpoints.guardar("scrape", clave, {"html": item["html"]})
+        return item
+
+    def _parse(self, item):
+        if item["tipo"] == "web":
+            if "html" not in item:
+                return item
+            clave = f"{item['id']}:{_hash(item['html'])}"
+            guardado = self.checkpoints.leer("parse", clave, item["id"])
+            if guardado is not None:
+                self.stats["parse"].sumar("reutilizados")
+            else:
+                guardado = {"contenido": self.parser_html.parsear_detalle(item.pop("html"))}
+                self.checkpoints.guardar("parse", clave, guardado, item["id"])
+            item.pop("html", None)
+            item["beca"]["contenido"] = guardado["contenido"]
+            return item
+
+        clave = f"{item['id']}:{item['hash_fuente']}"
+        guardado = self.checkpoints.leer("parse", clave, item["id"])
+        if guardado is not None:
+            self.stats["parse"].sumar("reutilizados")
+        else:
+            guardado = {"paginas": _docs_a_json(PyPDFLoader(item["ruta"]).load())}
+            self.checkpoints.guardar("parse", clave, guardado, item["id"])
+        item["paginas"] = guardado["paginas"]
+        return item
+
+    def _normalize(self, item):
+        if item["tipo"] == "web":
+            documentos = _docs_a_json([documento_beca(item["beca"])])
+            with self.lock:
+                self.becas[item["id"]] = item.pop("beca")
+        else:
+            documentos = item.pop("paginas")
+
+        item["documentos"] = documentos
+        item["hash"] = _hash(documentos)
+        self.checkpoints.guardar("normalize", f"{item['id']}:{item['hash']}", {"documentos": documentos}, item["id"])
+
+        previo = self.registro.get(item["id"])
+        categoria = "nuevos" if previo is None else (
+            "sin_cambios" if previo["hash"] == item["hash"] else "modificados")
+        with self.lock:
+            self.cambios[categoria].append(item["id"])
+
+        if self.dry_run:
+            self.stats["normalize"].sumar("omitidos")
+            return None
+        if self.solo_cambios and categoria == "sin_cambios" and not self.dedupe:
+            self.stats["normalize"].sumar("omitidos")
+            return None
+        # Con dedupe, los ítems sin cambios siguen (sus fragmentos salen de los
+        # checkpoints) porque un cambio en otro ítem puede alterar sus duplicados
+        return item
+
+    def _chunk(self, item):
+        clave = f"{item['id']}:{item['hash']}:{_hash(self.config_chunker)}"
+        guardado = self.checkpoints.leer("chunk", clave, item["id"])
+        if guardado is not None:
+            self.stats["chunk"].sumar("reutilizados")
+        else:
+            guardado = {"chunks": _docs_a_json(get_text_chunks(_json_a_docs(item["documentos"])))}
+            self.checkpoints.guardar("chunk", clave, guardado, item["id"])
+        del item["documentos"]
+        # Ids deterministas: reintentar un upsert es idempotente
+        item["chunks"] = [dict(c, id=f"{item['id']}#{i}") for i, c in enumerate(guardado["chunks"])]
+        return item
+
+    def _dedupe(self, item):
+        if not self.dedupe:
+            return item
+        with self.lock:
+            self.lote_dedupe.append(item)
+        return None
+
+    def _marcar_fallido(self, item_id):
+        with self.lock:
+            self.fallidos.add(item_id)
+
+    def _cerrar_dedupe(self):
+        """Fusiona los casi duplicados de todo el lote y libera los ítems hacia embed."""
+        if not self.dedupe or not self.lote_dedupe:
+            return []
+        try:
+            return self._fusionar_lote()
+        except Exception:
+            # Ningún ítem del lote llega al índice: todos conservan su versión anterior
+            for item in self.lote_dedupe:
+                self._marcar_fallido(item["id"])
+            raise
+
+    def _fusionar_lote(self):
+        fragmentos = [(item, c) for item in self.lote_dedupe for c in item["chunks"]]
+        conservados, metadatos_finales, self.reporte_dedupe = deduplicar(
+            [c["page_content"] for _, c in fragmentos], [c["metadata"] for _, c in fragmentos])
+        print(f"   {resumen_reporte(self.reporte_dedupe)}")
+
+        por_item = {id(item): [] for item in self.lote_dedupe}
+        for i in conservados:
+            item, chunk = fragmentos[i]
+            por_item[id(item)].append(dict(chunk, metadata=metadatos_finales.get(i, chunk["metadata"])))
+
+        salientes = []
+        for item in self.lote_dedupe:
+            item["chunks"] = por_item[id(item)]
+            item["hash_indice"] = _hash(item["chunks"])
+            previo = self.registro.get(item["id"], {})
+            if self.solo_cambios and previo.get("hash_indice") == item["hash_indice"]:
+                self.stats["dedupe"].sumar("omitidos")
+                continue
+            salientes.append(item)
+        self.lote_dedupe = []
+        return salientes
+
+    def _embed(self, item):
+        textos = [c["page_content"] for c in item["chunks"]]
+        clave = f"{item['id']}:{_hash(textos)}:{EMBEDDING_MODEL}"
+        guardado = self.checkpoints.leer("embed", clave, item["id"])
+        if guardado is not None:
+            self.stats["embed"].sumar("reutilizados")
+        else:
+            guardado = {"embeddings": self.embedding.embed_documents(textos) if textos else []}
+            self.checkpoints.guardar("embed", clave, guardado, item["id"])
+        item["embeddings"] = guardado["embeddings"]
+        return item
+
+    def _upsert(self, item):
+        ids = [c["id"] for c in item["chunks"]]
+        anteriores = self.registro.get(item["id"], {}).get("ids", [])
+        # Primero los fragmentos nuevos: si el upsert falla, el ítem conserva los anteriores
+        if ids:
+            self.escritor.upsert(
+                ids,
+                [c["page_content"] for c in item["chunks"]],
+                item["embeddings"],
+                [c["metadata"] for c in item["chunks"]],
+            )
+        self.escritor.eliminar([i for i in anteriores if i not in set(ids)])
+        self.registro[item["id"]] = {"hash": item["hash"], "hash_indice": item.get("hash_indice"), "ids": ids}
+        return None
+
+    # --------------------------------------------------------
+    # Ejecución
+    # --------------------------------------------------------
+    def ejecutar(self):
+        inicio = time.perf_counter()
+        self._preparar_ejecucion()
+        self._preparar_indice()
+        if not self.dry_run:
+            self.embedding = get_embedding_model()
+
+        funciones = {
+            "scrape": self._scrape, "parse": self._parse, "normalize": self._normalize,
+            "chunk": self._chunk, "dedupe": self._dedupe, "embed": self._embed, "upsert": self._upsert,
+        }
+        colas = [queue.Queue(maxsize=self.tam_cola) for _ in ETAPAS]
+        etapas = [
+            Etapa(nombre, funciones[nombre], self.hilos[nombre], colas[i],
+                  colas[i + 1] if i + 1 < len(ETAPAS) else None, self.stats[nombre],
+                  al_terminar=self._cerrar_dedupe if nombre == "dedupe" else None,
+                  al_fallar=self._marcar_fallido)
+            for i, nombre in enumerate(ETAPAS)
+        ]
+
+        publicado = False
+        try:
+            try:
+                for etapa in etapas:
+                    etapa.iniciar()
+                for item in self._fuentes():
+                    self.vistos.add(item["id"])
+                    colas[0].put(item)
+                colas[0].put(_FIN)
+                for etapa in etapas:
+                    etapa.esperar()
+            finally:
+                for driver in self._drivers:
+                    driver.quit()
+
+            errores = sum(s.errores for s in self.stats.values())
+            eliminados = self._eliminados()
+            if self.dry_run:
+                self._reportar_dry_run(eliminados)
+            else:
+                publicado = self._finalizar(errores, eliminados)
+        finally:
+            # Cualquier salida sin publicar (errores, excepción, Ctrl+C) deja intacto el índice vigente
+            if self.escritor is not None and not publicado:
+                self.escritor.descartar()
+        self._reportar(time.perf_counter() - inicio, errores)
+        return publicado if not self.dry_run else errores == 0
+
+    def _eliminados(self):
+        """Ítems del índice que ya no existen en las fuentes."""
+        faltantes = [i for i in self.registro if i not in self.vistos]
+        if not self.listado_completo:
+            # Sin listado completo no sabemos qué becas desaparecieron
+            faltantes = [i for i in faltantes if not i.startswith("web:")]
+        return faltantes
+
+    def _finalizar(self, errores, eliminados):
+        """
+        Publica la copia de preparación del índice. Devuelve True si se publicó.
+        Los ítems con error conservan sus fragmentos anteriores (la copia parte
+        del índice vigente) y su entrada anterior del corpus.
+        """
+        tasa = len(self.fallidos) / len(self.vistos) if self.vistos else 0.0
+        if not self.listado_completo or tasa > self.max_tasa_errores:
+            # No se publica nada: la próxima ejecución reanuda desde los checkpoints
+            print(f"⚠️ Ingesta incompleta ({errores} errores en {len(self.fallidos)} ítems): "
+                  "el índice vigente no cambió; ejecuta de nuevo para reanudar.")
+            return False
+        if self.fallidos:
+            print(f"⚠️ {len(self.fallidos)} ítems con error conservan su versión anterior y se "
+                  "reintentarán en la próxima ejecución:")
+            for item_id in sorted(self.fallidos)[:20]:
+                print(f"      - {item_id}")
+
+        for item_id in eliminados:
+            self.escritor.eliminar(self.registro.pop(item_id)["ids"])
+
+        # Mismas fuentes que usa app.py (os.listdir("docs")) para que el manifiesto coincida
+        pdfs = os.listdir("docs") if os.path.exists("docs") else []
+        manifest = manifest_actual(pdfs, self.backend.nombre, self.backend.codificacion, dedupe=self.dedupe)
+
+        # El corpus nuevo se prepara al lado del vigente y se cambia recién al
+        # publicar: antes, una sesión vería una fuente modificada contra el
+        # manifiesto anterior y regeneraría el índice por su cuenta
+        corpus_nuevo = self._preparar_corpus()
+        try:
+            if corpus_nuevo is not None:
+                _registrar_fuente(manifest, CORPUS_JSON, corpus_nuevo)
+            self.escritor.publicar(manifest)
+            if corpus_nuevo is not None:
+                os.replace(corpus_nuevo, CORPUS_JSON)
+        finally:
+            if corpus_nuevo is not None and os.path.exists(corpus_nuevo):
+                os.remove(corpus_nuevo)
+        self.checkpoints.guardar_registro(self.backend.nombre, {"built_at": manifest["built_at"], "items": self.registro})
+        self.checkpoints.guardar_estado({"run_id": self.run_id, "completado": True})
+        self.checkpoints.limpiar_etapa("scrape")
+        self.checkpoints.limpiar_etapa("listado")
+        podados = sum(self.checkpoints.podar(etapa, self.vistos) for etapa in ("parse", "normalize", "chunk", "embed"))
+        if podados:
+            print(f"Se eliminaron {podados} checkpoints de ítems eliminados o versiones anteriores.")
+        return True
+
+    def _preparar_corpus(self):
+        """
+        Escribe el corpus JSON alineado con el índice en un archivo temporal y
+        devuelve su ruta (None con --no-scrape, que no cambia el corpus).
+        """
+        if self.sin_scraping:
+            return None
+        anteriores = {}
+        if os.path.exists(CORPUS_JSON):
+            with open(CORPUS_JSON, "r", encoding="utf-8") as f:
+                anteriores = {f"web:{b['nivel']}:{b['url']}": b for b in json.load(f)}
+        corpus = []
+        for item_id in self.orden_becas:
+            # Un ítem con error queda en el corpus como está en el índice: en su versión anterior
+            beca = anteriores.get(item_id) if item_id in self.fallidos else self.becas.get(item_id)
+            if beca is not None:
+                corpus.append(beca)
+        os.makedirs(os.path.dirname(CORPUS_JSON), exist_ok=True)
+        ruta = f"{CORPUS_JSON}.{self.run_id}.tmp"
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(corpus, f, ensure_ascii=False, indent=4)
+        return ruta
+
+    # --------------------------------------------------------
+    # Reportes
+    # --------------------------------------------------------
+    def _reportar_dry_run(self, eliminados):
+        print("\n🔎 Dry run: no se escribió nada.")
+        for categoria, items in list(self.cambios.items()) + [("eliminados", eliminados)]:
+            print(f"   {categoria}: {len(items)}")
+            if categoria != "sin_cambios":
+                for item_id in sorted(items)[:20]:
+                    print(f"      - {item_id}")
+
+    def _reportar(self, duracion, errores):
+        print("\n" + "=" * 72)
+        print(f"{'etapa':>10} {'hilos':>6} {'proc.':>7} {'checkp.':>8} {'omit.':>6} {'err.':>5} {'ocupado s':>10} {'ítems/s':>8}")
+        for nombre in ETAPAS:
+            s = self.stats[nombre]
+            por_segundo = s.procesados / s.segundos if s.segundos else 0.0
+            print(f"{nombre:>10} {self.hilos[nombre]:>6} {s.procesados:>7} {s.reutilizados:>8} "
+                  f"{s.omitidos:>6} {s.errores:>5} {s.segundos:>10.2f} {por_segundo:>8.1f}")
+        total = len(self.vistos)
+        print("-" * 72)
+        print(f"{total} ítems en {duracion:.1f} s ({total / duracion if duracion else 0:.2f} ítems/s) | "
+              f"nuevos: {len(self.cambios['nuevos'])}, modificados: {len(self.cambios['modificados'])}, "
+              f"sin cambios: {len(self.cambios['sin_cambios'])} | errores: {errores}")
+        if self.reporte_dedupe:
+            print(resumen_reporte(self.reporte_dedupe))
+
+
+# ============================================================
+# Ejecución directa
+# ============================================================
+def _registrar_fuente(manifest, ruta, contenido):
+    """Registra en el manifiesto la fuente `ruta` con el hash de `contenido` (aún sin publicar)."""
+    fuentes = [s for s in manifest["sources"] if s["path"] != ruta]
+    fuentes.append({"path": ruta, "sha256": hash_archivo(contenido), "bytes": os.path.getsize(contenido)})
+    manifest["sources"] = sorted(fuentes, key=lambda s: s["path"])
+
+
+def _tasa(valor):
+    tasa = float(valor)
+    if not 0 <= tasa <= 1:
+        raise argparse.ArgumentTypeError("La tasa debe estar entre 0 y 1")
+    return tasa
+
+
+def _parsear_hilos(valor):
+    etapa, _, cantidad = valor.partition("=")
+    if etapa not in ETAPAS or not cantidad.isdigit() or int(cantidad) < 1:
+        raise argparse.ArgumentTypeError(f"Formato esperado etapa=N con etapa en {', '.join(ETAPAS)}")
+    return etapa, int(cantidad)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingesta por lotes reanudable de BecaBot UTPL.")
+    parser.add_argument("--backend", help="'chroma' o 'numpy' (por defecto BECABOT_VECTOR_BACKEND)")
+    parser.add_argument("--parser", help="Parser HTML: 'lxml' o 'bs4'")
+    parser.add_argument("--only-changed", action="store_true", help="Solo re-embeber e indexar ítems nuevos o modificados")
+    parser.add_argument("--dry-run", action="store_true", help="Mostrar qué cambiaría sin escribir nada")
+    parser.add_argument("--no-scrape", action="store_true", help=f"Usar {CORPUS_JSON} en lugar de descargar la web")
+    parser.add_argument("--restart", action="store_true", help="Ignorar la ejecución incompleta anterior")
+    parser.add_argument("--max-error-rate", type=_tasa, default=MAX_TASA_ERRORES,
+                        help="Fracción máxima de ítems con error para publicar igualmente; los ítems con "
+                             f"error conservan su versión anterior (por defecto {MAX_TASA_ERRORES})")
+    parser.add_argument("--no-dedupe", action="store_true",
+                        help="No fusionar fragmentos casi duplicados aunque BECABOT_DEDUPE esté activo "
+                             "(las etapas no esperan a todos los ítems antes de embeber)")
+    parser.add_argument("--workers", action="append", type=_parsear_hilos, metavar="ETAPA=N",
+                        help="Hilos por etapa (repetible), p. ej. --workers scrape=3")
+    parser.add_argument("--queue-size", type=int, default=16, help="Capacidad de las colas entre etapas")
+    parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR, help="Directorio de checkpoints")
+    parser.add_argument("--warm-cache", action="store_true",
+                        help="Al terminar, precalcular las cachés con las preguntas más frecuentes")
+    args = parser.parse_args()
+    args.workers = dict(args.workers or [])
+
+    exito = Ingesta(args).ejecutar()
+    if exito and args.warm_cache and not args.dry_run:
+        from utils.cache_warm import calentar_cache
+        calentar_cache(backend=args.backend)
+    raise SystemExit(0 if exito else 1)
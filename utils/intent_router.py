@@ -0,0 +1,177 @@
+import os
+import time
+import threading
+from collections import namedtuple
+import numpy as np
+from utils.index_manifest import hash_archivo
+from utils.prepare_vectordb import CORPUS_JSON, extract_json_text, get_embedding_model
+
+# ============================================================
+# Enrutador local de intenciones (antes de la cadena RAG)
+# ============================================================
+# Clasifica la consulta por similitud con prototipos etiquetados usando el
+# mismo modelo de embeddings ya cargado para la base vectorial:
+# ├── saludo / agradecimiento / despedida: respuesta por plantilla
+# ├── enlace: URL de la beca directamente desde los metadatos del corpus
+# └── informacion: se envía a la cadena RAG (recuperación + Gemini)
+
+PROTOTIPOS = {
+    "saludo": [
+        "hola", "buenos días", "buenas tardes", "buenas noches",
+        "hola, ¿cómo estás?", "qué tal", "saludos",
+    ],
+    "agradecimiento": [
+        "gracias", "muchas gracias", "mil gracias", "te agradezco",
+        "gracias por la ayuda", "perfecto, gracias", "excelente, muchas gracias",
+    ],
+    "despedida": [
+        "adiós", "hasta luego", "chao", "nos vemos", "bye",
+        "eso es todo, adiós", "hasta pronto",
+    ],
+    "enlace": [
+        "dame el enlace de la beca", "pásame el link de la beca",
+        "¿cuál es la página web de la beca?", "quiero la url de la beca",
+        "¿dónde encuentro la página de la beca?", "link para ver la beca",
+    ],
+    "informacion": [
+        "¿qué requisitos tiene la beca?", "¿qué porcentaje cubre la beca?",
+        "¿cómo postulo a una beca?", "¿qué becas hay para posgrado?",
+        "¿cómo renuevo mi beca?", "¿qué documentos necesito para postular?",
+        "¿quién puede aplicar a la beca de excelencia?", "¿cuándo son las fechas de postulación?",
+    ],
+}
+
+RUTAS_CHARLA = {"saludo", "agradecimiento", "despedida"}
+
+PLANTILLAS = {
+    "saludo_inicial": "¡Hola! Soy BecaBot UTPL, tu asistente de becas. ¿En qué puedo ayudarte?",
+    "saludo": "¿En qué más puedo ayudarte con las becas UTPL?",
+    "agradecimiento": "¡Con gusto! Si tienes otra consulta sobre becas UTPL, aquí estoy para ayudarte.",
+    "despedida": "¡Hasta pronto! Te deseo mucho éxito en tu proceso de becas UTPL.",
+    "enlace": "Puedes consultar toda la información de la **{titulo}** en el sistema de becas UTPL: {url}",
+}
+
+# Umbrales de similitud coseno (embeddings normalizados)
+UMBRAL_CHARLA = 0.80        # la consulta debe parecerse mucho a un prototipo de charla
+MAX_PALABRAS_CHARLA = 6     # mensajes largos con saludo suelen traer una pregunta real
+UMBRAL_ENLACE = 0.60
+UMBRAL_TITULO = 0.55        # similitud mínima con el título de la beca
+MARGEN_TITULO = 0.03        # ventaja mínima sobre la segunda beca (evita ambigüedad)
+
+Ruta = namedtuple("Ruta", ["nombre", "respuesta", "contexto", "similitud"])
+
+_lock = threading.Lock()
+_prototipos = None          # (etiquetas, matriz de embeddings)
+_becas = None               # (hash del corpus, documentos, matriz de títulos)
+_latencias_rag = []         # últimas latencias de la cadena RAG (ms)
+
+
+def router_habilitado():
+    return os.getenv("BECABOT_INTENT_ROUTER", "1") != "0"
+
+
+# ============================================================
+# Índices en memoria (prototipos y títulos de becas)
+# ============================================================
+def _matriz_prototipos():
+    global _prototipos
+    with _lock:
+        if _prototipos is None:
+            etiquetas = [e for e, frases in PROTOTIPOS.items() for _ in frases]
+            frases = [f for lista in PROTOTIPOS.values() for f in lista]
+            matriz = np.asarray(get_embedding_model().embed_documents(frases), dtype=np.float32)
+            _prototipos = (etiquetas, matriz)
+    return _prototipos
+
+
+def _indice_becas():
+    """Títulos y documentos del corpus JSON; se reconstruye si el archivo cambia."""
+    global _becas
+    if not os.path.exists(CORPUS_JSON):
+        return [], None
+    huella = hash_archivo(CORPUS_JSON)
+    with _lock:
+        if _becas is None or _becas[0] != huella:
+            docs = [d for d in extract_json_text(CORPUS_JSON) if d.metadata.get("url")]
+            titulos = [d.metadata["titulo"] for d in docs]
+            matriz = np.asarray(get_embedding_model().embed_documents(titulos), dtype=np.float32) if titulos else None
+            _becas = (huella, docs, matriz)
+    return _becas[1], _becas[2]
+
+
+# ============================================================
+# Clasificación y respuesta
+# ============================================================
+def clasificar(vector):
+    """Devuelve (etiqueta, similitud) del prototipo más cercano."""
+    etiquetas, matriz = _matriz_prototipos()
+    similitudes = matriz @ vector
+    mejor = int(np.argmax(similitudes))
+    return etiquetas[mejor], float(similitudes[mejor])
+
+
+def _beca_mas_cercana(vector):
+    docs, matriz = _indice_becas()
+    if matriz is None:
+        return None, 0.0
+    similitudes = matriz @ vector
+    orden = np.argsort(-similitudes)
+    mejor = float(similitudes[orden[0]])
+    segunda = float(similitudes[orden[1]]) if len(orden) > 1 else -1.0
+    if mejor < UMBRAL_TITULO or mejor - segunda < MARGEN_TITULO:
+        return None, mejor
+    return docs[int(orden[0])], mejor
+
+
+def enrutar_consulta(pregunta, chat_history):
+    """
+    Decide la ruta de la consulta. Si `respuesta` es None, la consulta debe ir a RAG.
+    Cualquier error del enrutador envía la consulta a RAG.
+    """
+    if not router_habilitado():
+        return Ruta("informacion", None, [], 0.0)
+
+    inicio = time.perf_counter()
+    try:
+        vector = np.asarray(get_embedding_model().embed_query(pregunta), dtype=np.float32)
+        etiqueta, similitud = clasificar(vector)
+        ruta = Ruta("informacion", None, [], similitud)
+
+        if (etiqueta in RUTAS_CHARLA and similitud >= UMBRAL_CHARLA
+                and len(pregunta.split()) <= MAX_PALABRAS_CHARLA):
+            clave = "saludo_inicial" if etiqueta == "saludo" and not chat_history else etiqueta
+            ruta = Ruta(etiqueta, PLANTILLAS[clave], [], similitud)
+
+        elif etiqueta == "enlace" and similitud >= UMBRAL_ENLACE:
+            doc, similitud_titulo = _beca_mas_cercana(vector)
+            if doc is not None:
+                respuesta = PLANTILLAS["enlace"].format(titulo=doc.metadata["titulo"], url=doc.metadata["url"])
+                ruta = Ruta("enlace", respuesta, [doc], similitud_titulo)
+
+    except Exception as e:
+        print(f"⚠️ [router] Error al clasificar, se usará RAG: {e}")
+        ruta = Ruta("informacion", None, [], 0.0)
+
+    _registrar_decision(ruta, (time.perf_counter() - inicio) * 1000)
+    return ruta
+
+
+# ============================================================
+# Registro de decisiones y latencia ahorrada
+# ============================================================
+def registrar_latencia_rag(ms):
+    """Guarda la latencia de una respuesta RAG para estimar el ahorro del enrutador."""
+    _latencias_rag.append(ms)
+    del _latencias_rag[:-50]
+
+
+def _registrar_decision(ruta, ms):
+    if ruta.respuesta is None:
+        print(f"[router] ruta=rag (sim={ruta.similitud:.2f}, {ms:.1f} ms)")
+        return
+    if _latencias_rag:
+        promedio = sum(_latencias_rag) / len(_latencias_rag)
+        ahorro = f"ahorro estimado ≈ {promedio - ms:.0f} ms"
+    else:
+        ahorro = "ahorro estimado: sin datos de RAG aún"
+    print(f"[router] ruta={ruta.nombre} (sim={ruta.similitud:.2f}, {ms:.1f} ms) | {ahorro}")
@@ -1,13 +1,15 @@
 import os
 import json
 import warnings
+import threading
 from dotenv import load_dotenv
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
 from langchain.docstore.document import Document
-import chromadb
+from utils.vector_store import get_backend
+from utils.index_manifest import construir_manifest, leer_manifest, motivo_desactualizado
+from utils.dedupe import config_dedupe, deduplicar_documentos, dedupe_habilitado, resumen_reporte
 
 # ============================================================
 # 🔧 Configuración del entorno
@@ -41,6 +43,57 @@ def extract_pdf_text(pdfs):
 # ============================================================
 # Función para extraer texto de JSON del scraping (ACTUALIZADA)
 # ============================================================
+def documento_beca(item):
+    """Convierte una beca del corpus (dict del scraping) en un Document para indexar."""
+    # 1. Extraer campos principales
+    titulo = item.get("titulo", "Beca sin título")
+    url = item.get("url", "")
+    nivel = item.get("nivel", "General")
+    
+    # Convertimos listas a strings para el texto
+    tipos = ", ".join(item.get("tipos", []))
+    modalidades = ", ".join(item.get("modalidades", []))
+    
+    # 2. Aplanar el diccionario de contenido
+    # Convertimos {"Requisitos": "X", "Porcentaje": "Y"} a texto plano
+    contenido_raw = item.get("contenido", {})
+    contenido_texto = ""
+    
+    if isinstance(contenido_raw, dict):
+        for clave, valor in contenido_raw.items():
+            # Limpiamos saltos de línea excesivos
+            valor_limpio = str(valor).replace('\n', ' ').strip()
+            contenido_texto += f"- {clave}: {valor_limpio}\n"
+    else:
+        # Fallback si por alguna razón llega como string
+        contenido_texto = str(contenido_raw)
+
+    # 3. Construir el Page Content (Lo que leerá la IA)
+    # Estructuramos el texto para darle contexto semántico
+    page_content = f"""
+                TÍTULO DE LA BECA: {titulo}
+                NIVEL ACADÉMICO: {nivel}
+                TIPO: {tipos}
+                MODALIDAD: {modalidades}
+                ENLACE: {url}
+
+                DETALLES, REQUISITOS Y BENEFICIOS:
+                {contenido_texto}
+                """
+
+    # 4. Crear el Documento con Metadatos
+    return Document(
+        page_content=page_content,
+        metadata={
+            "source": "corpus_utpl.json",
+            "titulo": titulo,
+            "url": url,
+            "nivel": nivel,
+            "tipo": tipos  # Chroma prefiere strings en metadatos
+        }
+    )
+
+
 def extract_json_text(json_path="knowledge_base/corpus_utpl.json"):
     docs = []
     if not os.path.exists(json_path):
@@ -54,54 +107,7 @@ def extract_json_text(json_path="knowledge_base/corpus_utpl.json"):
             print(f"📂 Procesando {len(data)} becas del archivo JSON...")
 
             for item in data:
-                # 1. Extraer campos principales
-                titulo = item.get("titulo", "Beca sin título")
-                url = item.get("url", "")
-                nivel = item.get("nivel", "General")
-                
-                # Convertimos listas a strings para el texto
-                tipos = ", ".join(item.get("tipos", []))
-                modalidades = ", ".join(item.get("modalidades", []))
-                
-                # 2. Aplanar el diccionario de contenido
-                # Convertimos {"Requisitos": "X", "Porcentaje": "Y"} a texto plano
-                contenido_raw = item.get("contenido", {})
-                contenido_texto = ""
-                
-                if isinstance(contenido_raw, dict):
-                    for clave, valor in contenido_raw.items():
-                        # Limpiamos saltos de línea excesivos
-                        valor_limpio = str(valor).replace('\n', ' ').strip()
-                        contenido_texto += f"- {clave}: {valor_limpio}\n"
-                else:
-                    # Fallback si por alguna razón llega como string
-                    contenido_texto = str(contenido_raw)
-
-                # 3. Construir el Page Content (Lo que leerá la IA)
-                # Estructuramos el texto para darle contexto semántico
-                page_content = f"""
-                TÍTULO DE LA BECA: {titulo}
-                NIVEL ACADÉMICO: {nivel}
-                TIPO: {tipos}
-                MODALIDAD: {modalidades}
-                ENLACE: {url}
-
-                DETALLES, REQUISITOS Y BENEFICIOS:
-                {contenido_texto}
-                """
-
-                # 4. Crear el Documento con Metadatos
-                doc = Document(
-                    page_content=page_content,
-                    metadata={
-                        "source": "corpus_utpl.json",
-                        "titulo": titulo,
-                        "url": url,
-                        "nivel": nivel,
-                        "tipo": tipos  # Chroma prefiere strings en metadatos
-                    }
-                )
-                docs.append(doc)
+                docs.append(documento_beca(item))
                 
         print(f"Se cargaron exitosamente {len(docs)} documentos desde el JSON.")
         
@@ -114,51 +120,161 @@ def extract_json_text(json_path="knowledge_base/corpus_utpl.json"):
 # ============================================================
 # División del texto en fragmentos
 # ============================================================
+CHUNK_SIZE = 2000      # Aumentado para evitar fragmentar becas individuales
+CHUNK_OVERLAP = 300    # Mayor overlap para preservar contexto
+SEPARADORES = ["\n\n", "\nTÍTULO DE LA BECA:", "\n", " ", ""]
+
+
 def get_text_chunks(docs):
     text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=2000,     # Aumentado para evitar fragmentar becas individuales
-        chunk_overlap=300,   # Mayor overlap para preservar contexto
-        separators=["\n\n", "\nTÍTULO DE LA BECA:", "\n", " ", ""]
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=SEPARADORES
     )
     return text_splitter.split_documents(docs)
 
 
+# ============================================================
+# Modelo de embeddings compartido por el proceso
+# ============================================================
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"  # Modelo mejor que L3
+_embedding_model = None
+
+
+def get_embedding_model():
+    """
+    Devuelve el modelo de embeddings, cargándolo una sola vez por proceso.
+    Todas las sesiones y backends comparten la misma instancia.
+    """
+    global _embedding_model
+    if _embedding_model is None:
+        # Usamos un modelo de embeddings mejorado
+        # Configuración especial para evitar el error de meta tensors
+        _embedding_model = HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL,
+            model_kwargs={
+                "device": "cpu",
+                "trust_remote_code": True
+            },
+            encode_kwargs={"normalize_embeddings": True}
+        )
+    return _embedding_model
+
+
+# ============================================================
+# Manifiesto: qué fuentes y configuración alimentan el índice
+# ============================================================
+CORPUS_JSON = "knowledge_base/corpus_utpl.json"
+
+
+def fuentes_indice(pdfs):
+    """Rutas de todos los archivos que alimentan el índice."""
+    return [os.path.join("docs", pdf) for pdf in pdfs] + [CORPUS_JSON]
+
+
+def manifest_actual(pdfs, backend_nombre, codificacion=None, dedupe=None):
+    """
+    Manifiesto que tendría un índice construido ahora mismo con estas fuentes.
+    La codificación de los vectores y la deduplicación solo se registran si
+    están activas. `dedupe` indica si la construcción deduplica (por defecto,
+    BECABOT_DEDUPE).
+
+    Activar o desactivar la codificación sí regenera el índice. Un manifiesto
+    sin "dedupe" sigue vigente aunque la deduplicación esté activa (ver
+    motivo_desactualizado): se aplica en la próxima regeneración.
+    """
+    configuracion = {"encoding": codificacion} if codificacion else {}
+    chunker = {
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "separators": SEPARADORES,
+    }
+    if dedupe_habilitado() if dedupe is None else dedupe:
+        chunker["dedupe"] = config_dedupe()
+    return construir_manifest(fuentes_indice(pdfs), {
+        **configuracion,
+        "backend": backend_nombre,
+        "chunker": chunker,
+        "embedding": {"model": EMBEDDING_MODEL, "normalize": True},
+    })
+
+
 # ============================================================
 # Generación o carga de la base vectorial
 # ============================================================
-def get_vectorstore(pdfs, from_session_state=False):
-    load_dotenv()
+# Evita que varias sesiones del mismo proceso regeneren el índice a la vez
+_lock_regeneracion = threading.Lock()
 
-    # Usamos un modelo de embeddings mejorado
-    # Configuración especial para evitar el error de meta tensors
-    embedding = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2",  # Modelo mejor que L3
-        model_kwargs={
-            "device": "cpu",
-            "trust_remote_code": True
-        },
-        encode_kwargs={"normalize_embeddings": True}
-    )
+# Instancias compartidas por todas las sesiones del proceso:
+# (backend, persist_dir) -> (built_at del manifiesto, vectordb)
+_instancias = {}
+_lock_instancias = threading.Lock()
 
-    persist_dir = "Vector_DB - Documents"
 
-    if from_session_state and os.path.exists(persist_dir):
-        try:
-            settings = chromadb.config.Settings(
-                anonymized_telemetry=False,
-                allow_reset=True,
-                chroma_telemetry_impl="none"
-            )
-            client = chromadb.PersistentClient(path=persist_dir, settings=settings)
-            vectordb = Chroma(
-                client=client,
-                embedding_function=embedding
-            )
-            print("Base vectorial cargada desde el disco.")
+def _compartir(backend_vectorial, built_at, vectordb):
+    with _lock_instancias:
+        _instancias[(backend_vectorial.nombre, backend_vectorial.persist_dir)] = (built_at, vectordb)
+    return vectordb
+
+
+def _cargar_si_vigente(backend_vectorial, embedding, manifest):
+    """
+    Abre el índice en disco si su manifiesto coincide con el estado actual.
+    Si el proceso ya lo tiene abierto (mismo built_at), devuelve esa instancia.
+    """
+    if not backend_vectorial.existe():
+        return None
+    motivo = motivo_desactualizado(backend_vectorial.persist_dir, manifest)
+    if motivo:
+        print(f"Índice desactualizado ({motivo}), se regenerará.")
+        return None
+
+    built_at = (leer_manifest(backend_vectorial.persist_dir) or {}).get("built_at")
+    with _lock_instancias:
+        compartida = _instancias.get((backend_vectorial.nombre, backend_vectorial.persist_dir))
+    if compartida is not None and compartida[0] == built_at:
+        return compartida[1]
+    try:
+        vectordb = backend_vectorial.cargar(embedding)
+        print("Base vectorial vigente cargada desde el disco.")
+        return _compartir(backend_vectorial, built_at, vectordb)
+    except Exception as e:
+        print(f"⚠️ Error al cargar existente, se regenerará: {e}")
+        return None
+
+
+def get_vectorstore(pdfs, from_session_state=False, backend=None):
+    """
+    Carga la base vectorial persistida o la regenera desde PDFs + JSON.
+
+    Parámetros:
+    - pdfs (list): nombres de los PDFs en /docs
+    - from_session_state (bool): usar el índice en disco si su manifiesto está vigente;
+      con False se fuerza la regeneración
+    La instancia devuelta es compartida por todas las sesiones del proceso.
+    - backend (str): 'chroma' o 'numpy'; por defecto BECABOT_VECTOR_BACKEND o 'chroma'
+    """
+    load_dotenv()
+
+    embedding = get_embedding_model()
+    backend_vectorial = get_backend(backend)
+    manifest = manifest_actual(pdfs, backend_vectorial.nombre, backend_vectorial.codificacion)
+
+    if from_session_state:
+        vectordb = _cargar_si_vigente(backend_vectorial, embedding, manifest)
+        if vectordb is not None:
             return vectordb
-        except Exception as e:
-            print(f"⚠️ Error al cargar existente, se regenerará: {e}")
 
+    with _lock_regeneracion:
+        # Otra sesión pudo haber regenerado el índice mientras esperábamos
+        if from_session_state:
+            vectordb = _cargar_si_vigente(backend_vectorial, embedding, manifest)
+            if vectordb is not None:
+                return vectordb
+        return _regenerar(pdfs, backend_vectorial, embedding, manifest)
+
+
+def _regenerar(pdfs, backend_vectorial, embedding, manifest):
     # Regeneración completa
     print("Iniciando regeneración de base vectorial...")
     
@@ -166,7 +282,7 @@ def get_vectorstore(pdfs, from_session_state=False):
     docs_pdf = extract_pdf_text(pdfs)
     
     # 2. Cargar JSON (Nueva lógica)
-    docs_json = extract_json_text("knowledge_base/corpus_utpl.json")
+    docs_json = extract_json_text(CORPUS_JSON)
 
     all_docs = docs_pdf + docs_json
     
@@ -178,23 +294,22 @@ def get_vectorstore(pdfs, from_session_state=False):
     chunks = get_text_chunks(all_docs)
     print(f"Total de fragmentos generados: {len(chunks)}")
 
-    # 4. Crear Vector Store
+    # 3.1 Fusionar fragmentos casi duplicados (manual PDF vs páginas web)
+    if dedupe_habilitado():
+        chunks, reporte = deduplicar_documentos(chunks)
+        print(resumen_reporte(reporte))
+
+    # 4. Crear Vector Store y publicarlo (el manifiesto pasa a apuntar al nuevo índice)
     try:
-        settings = chromadb.config.Settings(
-            anonymized_telemetry=False,
-            allow_reset=True,
-            chroma_telemetry_impl="none"
-        )
-        client = chromadb.PersistentClient(path=persist_dir, settings=settings)
-        vectordb = Chroma.from_documents(
-            documents=chunks,
-            embedding=embedding,
-            client=client
-        )
-        print("Base vectorial creada y guardada correctamente en disco.")
-        return vectordb
+        vectordb = backend_vectorial.construir(chunks, embedding)
+        backend_vectorial.publicar(manifest)
+        print(f"Base vectorial ({backend_vectorial.nombre}) creada y guardada correctamente en disco.")
+        # La huella cambió: recalentar la caché con las preguntas frecuentes sin bloquear a la sesión
+        from utils.cache_warm import calentar_en_segundo_plano
+        calentar_en_segundo_plano(backend_vectorial.nombre, vectordb)
+        return _compartir(backend_vectorial, manifest["built_at"], vectordb)
     except Exception as e:
-        print(f"❌ Error al crear la base vectorial en Chroma: {e}")
+        print(f"❌ Error al crear la base vectorial ({backend_vectorial.nombre}): {e}")
         return None
 
 
@@ -0,0 +1,207 @@
+import numpy as np
+
+# ============================================================
+# Cuantizadores para el backend NumPy
+# ============================================================
+# Representaciones comprimidas de la matriz de embeddings normalizados.
+# La búsqueda recorre solo los códigos comprimidos (puntaje aproximado) y
+# luego se recalcula el puntaje exacto de los mejores candidatos contra los
+# vectores completos, que quedan en disco (mmap) y casi no se leen.
+#
+# ├── int8: cuantización escalar por dimensión (4x menos que float32)
+# └── pq:   product quantization, m subespacios x 256 centroides (1 byte por subespacio)
+#
+# RESCORE_DEFAULT es cuántas veces k se reordenan con los vectores completos
+# si el store no indica otro factor. PQ aproxima mucho peor que int8 y necesita
+# un factor mayor: en benchmarks/bench_quantization.py, con 4 su recall@10
+# ronda 0.6-0.75 y con 16 supera 0.85 incluso con vectores aleatorios.
+
+# Filas por bloque al calcular puntajes (acota la memoria temporal)
+TAMANO_BLOQUE = 8192
+
+
+class Cuantizador:
+    """
+    Interfaz común de los cuantizadores.
+
+    Métodos:
+    - entrenar(matriz): ajusta los parámetros a los vectores (float32, normalizados)
+    - codificar(matriz): devuelve la matriz de códigos
+    - puntajes(codigos, consulta): similitud aproximada de la consulta contra los códigos
+    - parametros() / desde_parametros(dict): arrays para guardar en .npz y restaurar
+    - descripcion(): dict que se registra en config.json y en el manifiesto
+    """
+    nombre = "base"
+    RESCORE_DEFAULT = 4
+
+    def entrenar(self, matriz):
+        raise NotImplementedError
+
+    def codificar(self, matriz):
+        raise NotImplementedError
+
+    def puntajes(self, codigos, consulta):
+        raise NotImplementedError
+
+    def parametros(self):
+        raise NotImplementedError
+
+    @classmethod
+    def desde_parametros(cls, parametros):
+        raise NotImplementedError
+
+    def descripcion(self):
+        return {"type": self.nombre}
+
+
+class CuantizadorInt8(Cuantizador):
+    """Un int8 por dimensión con escala propia: x ≈ codigo * escala[d]."""
+    nombre = "int8"
+
+    def __init__(self, escala=None):
+        self.escala = escala
+
+    def entrenar(self, matriz):
+        maximo = np.abs(matriz).max(axis=0) if len(matriz) else np.ones(matriz.shape[1])
+        self.escala = (np.maximum(maximo, 1e-12) / 127.0).astype(np.float32)
+        return self
+
+    def codificar(self, matriz):
+        return np.clip(np.rint(matriz / self.escala), -127, 127).astype(np.int8)
+
+    def puntajes(self, codigos, consulta):
+        # codigo · (escala ⊙ q) == (codigo ⊙ escala) · q, sin reconstruir la matriz
+        consulta = (consulta * self.escala).astype(np.float32)
+        resultado = np.empty(codigos.shape[0], dtype=np.float32)
+        for inicio in range(0, codigos.shape[0], TAMANO_BLOQUE):
+            bloque = np.asarray(codigos[inicio:inicio + TAMANO_BLOQUE], dtype=np.float32)
+            resultado[inicio:inicio + len(bloque)] = bloque @ consulta
+        return resultado
+
+    def parametros(self):
+        return {"escala": self.escala}
+
+    @classmethod
+    def desde_parametros(cls, parametros):
+        return cls(escala=parametros["escala"])
+
+
+class CuantizadorPQ(Cuantizador):
+    """
+    Product quantization: la dimensión se divide en m subespacios y cada uno
+    se reemplaza por el índice (uint8) de su centroide más cercano.
+    El puntaje usa una tabla de m x 256 productos punto por consulta.
+    """
+    nombre = "pq"
+    RESCORE_DEFAULT = 16
+    CENTROIDES = 256
+    ITERACIONES = 20
+    MUESTRA_ENTRENAMIENTO = 20000
+
+    def __init__(self, subespacios=48, centroides=None, estricto=False):
+        self.subespacios = subespacios
+        self.centroides = centroides        # (m, K, D/m)
+        # Con 'pq<m>' el m pedido debe dividir la dimensión; con 'pq' se ajusta solo
+        self.estricto = estricto
+        if centroides is not None:
+            self.subespacios = centroides.shape[0]
+
+    @staticmethod
+    def _divisor(dimension, deseado):
+        """Mayor divisor de la dimensión que no supera el número de subespacios pedido."""
+        return max(d for d in range(1, min(deseado, dimension) + 1) if dimension % d == 0)
+
+    def _partes(self, matriz):
+        n, dimension = matriz.shape
+        return matriz.reshape(n, self.subespacios, dimension // self.subespacios)
+
+    @staticmethod
+    def _mas_cercanos(vectores, centroides):
+        distancias = (
+            -2 * vectores @ centroides.T
+            + (centroides ** 2).sum(axis=1)[None, :]
+        )
+        return np.argmin(distancias, axis=1)
+
+    def entrenar(self, matriz, semilla=0):
+        rng = np.random.default_rng(semilla)
+        dimension = matriz.shape[1]
+        if self.estricto and dimension % self.subespacios:
+            raise ValueError(
+                f"pq{self.subespacios}: {self.subespacios} subespacios no dividen la dimensión {dimension} "
+                f"de los embeddings; usa un divisor, p. ej. pq{self._divisor(dimension, self.subespacios)}")
+        self.subespacios = self._divisor(dimension, self.subespacios)
+        if len(matriz) > self.MUESTRA_ENTRENAMIENTO:
+            matriz = matriz[rng.choice(len(matriz), self.MUESTRA_ENTRENAMIENTO, replace=False)]
+        partes = self._partes(np.asarray(matriz, dtype=np.float32))
+        k = max(1, min(self.CENTROIDES, len(matriz)))
+
+        centroides = []
+        for j in range(self.subespacios):
+            datos = partes[:, j, :]
+            actuales = datos[rng.choice(len(datos), k, replace=False)].copy()
+            for _ in range(self.ITERACIONES):
+                # Lloyd vectorizado: suma y conteo por centroide en una pasada
+                asignacion = self._mas_cercanos(datos, actuales)
+                sumas = np.zeros_like(actuales)
+                np.add.at(sumas, asignacion, datos)
+                conteos = np.bincount(asignacion, minlength=k)
+                con_miembros = conteos > 0
+                actuales[con_miembros] = sumas[con_miembros] / conteos[con_miembros, None]
+            centroides.append(actuales)
+        self.centroides = np.stack(centroides).astype(np.float32)
+        return self
+
+    def codificar(self, matriz):
+        codigos = np.empty((len(matriz), self.subespacios), dtype=np.uint8)
+        for inicio in range(0, len(matriz), TAMANO_BLOQUE):
+            partes = self._partes(np.asarray(matriz[inicio:inicio + TAMANO_BLOQUE], dtype=np.float32))
+            for j in range(self.subespacios):
+                codigos[inicio:inicio + len(partes), j] = self._mas_cercanos(partes[:, j, :], self.centroides[j])
+        return codigos
+
+    def puntajes(self, codigos, consulta):
+        # tabla[j, c] = q_j · centroide_c del subespacio j
+        partes = consulta.reshape(self.subespacios, -1)
+        tabla = np.einsum("jd,jkd->jk", partes, self.centroides)
+        columnas = np.arange(self.subespacios)
+        resultado = np.empty(codigos.shape[0], dtype=np.float32)
+        for inicio in range(0, codigos.shape[0], TAMANO_BLOQUE):
+            bloque = np.asarray(codigos[inicio:inicio + TAMANO_BLOQUE])
+            resultado[inicio:inicio + len(bloque)] = tabla[columnas, bloque].sum(axis=1)
+        return resultado
+
+    def parametros(self):
+        return {"centroides": self.centroides}
+
+    @classmethod
+    def desde_parametros(cls, parametros):
+        return cls(centroides=parametros["centroides"])
+
+    def descripcion(self):
+        return {"type": self.nombre, "m": self.subespacios, "k": int(self.centroides.shape[1])}
+
+
+CUANTIZADORES = {
+    CuantizadorInt8.nombre: CuantizadorInt8,
+    CuantizadorPQ.nombre: CuantizadorPQ,
+}
+
+
+def get_cuantizador(nombre):
+    """
+    Devuelve un cuantizador sin entrenar ('int8', 'pq' o 'pq<m>', p. ej. 'pq24'),
+    o None para 'none'/vacío (vectores completos, búsqueda exacta).
+    En 'pq<m>', m debe ser >= 1 y dividir la dimensión de los embeddings
+    (384 con el modelo de la app); esto último se valida al entrenar.
+    """
+    if not nombre or nombre == "none":
+        return None
+    if nombre.startswith("pq") and nombre[2:].isdigit():
+        subespacios = int(nombre[2:])
+        if subespacios < 1:
+            raise ValueError(f"Codificación inválida: {nombre}. pq<m> necesita m >= 1 subespacios (p. ej. pq48)")
+        return CuantizadorPQ(subespacios=subespacios, estricto=True)
+    if nombre not in CUANTIZADORES:
+        raise ValueError(f"Codificación desconocida: {nombre}. Opciones: none, {', '.join(CUANTIZADORES)}, pq<m>")
+    return CUANTIZADORES[nombre]()
@@ -0,0 +1,145 @@
+import os
+import re
+import json
+import time
+import queue
+import atexit
+import threading
+import unicodedata
+
+# ============================================================
+# Registro de consultas (append-only, fuera del camino de la respuesta)
+# ============================================================
+# chat() solo encola el registro; un hilo en segundo plano lo escribe en un
+# archivo JSONL. Si la cola se llena (disco lento), el registro se descarta
+# en lugar de frenar la respuesta al estudiante.
+#
+# Cada línea:
+# {"ts", "pregunta" (normalizada), "ruta", "latencia_ms", "fuentes", "cache"}
+QUERY_LOG = os.getenv("BECABOT_QUERY_LOG", "knowledge_base/query_log.jsonl")
+TAMANO_COLA = 1000
+
+_cola = queue.Queue(maxsize=TAMANO_COLA)
+_lock = threading.Lock()
+_lock_archivo = threading.Lock()
+_hilo = None
+_descartados = 0
+
+
+def log_habilitado():
+    return os.getenv("BECABOT_QUERY_LOG_ENABLED", "1") != "0"
+
+
+def normalizar_pregunta(texto):
+    """Minúsculas, sin tildes ni signos de puntuación y con espacios simples."""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"[^\w\s]", " ", texto)
+    return " ".join(texto.split())
+
+
+def id_fuente(doc):
+    """Identificador legible del fragmento recuperado: PDF y página, o título de la beca."""
+    metadata = doc.metadata
+    source = os.path.basename(str(metadata.get("source", "desconocido")))
+    if "page" in metadata:
+        return f"{source}#p{metadata['page']}"
+    if "titulo" in metadata:
+        return f"{source}#{metadata['titulo']}"
+    return source
+
+
+# ============================================================
+# Escritura en segundo plano
+# ============================================================
+def _escribir(lineas):
+    directorio = os.path.dirname(QUERY_LOG)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    with _lock_archivo, open(QUERY_LOG, "a", encoding="utf-8") as f:
+        f.write("".join(lineas))
+
+
+def _pendientes(lineas=None):
+    """Saca de la cola todo lo acumulado sin bloquear."""
+    lineas = lineas or []
+    while True:
+        try:
+            lineas.append(_cola.get_nowait())
+        except queue.Empty:
+            return lineas
+
+
+def _trabajar():
+    while True:
+        # Espera la primera línea y escribe en un solo lote todo lo acumulado
+        lineas = _pendientes([_cola.get()])
+        try:
+            _escribir(lineas)
+        except OSError as e:
+            print(f"⚠️ [query_log] No se pudo escribir {QUERY_LOG}: {e}")
+        time.sleep(0.5)
+
+
+def _iniciar_hilo():
+    global _hilo
+    with _lock:
+        if _hilo is None:
+            _hilo = threading.Thread(target=_trabajar, name="query-log", daemon=True)
+            _hilo.start()
+            atexit.register(vaciar)
+
+
+def vaciar():
+    """Escribe lo pendiente (se llama al salir del proceso y desde scripts/benchmarks)."""
+    lineas = _pendientes()
+    if not lineas:
+        return
+    try:
+        _escribir(lineas)
+    except OSError as e:
+        print(f"⚠️ [query_log] No se pudo escribir {QUERY_LOG}: {e}")
+
+
+def registrar_consulta(pregunta, ruta, latencia_ms, documentos=(), cache=None):
+    """
+    Encola una consulta para el registro.
+
+    Parámetros:
+    - pregunta (str): texto original (se guarda normalizado)
+    - ruta (str): ruta del enrutador ('informacion', 'saludo', 'enlace', ...)
+    - latencia_ms (float): tiempo total hasta tener la respuesta
+    - documentos (list): Documents recuperados (se guardan solo sus identificadores)
+    - cache (str | None): 'respuesta', 'recuperacion', 'miss' o None si no aplica
+    """
+    global _descartados
+    if not log_habilitado():
+        return
+    registro = {
+        "ts": round(time.time(), 3),
+        "pregunta": normalizar_pregunta(pregunta),
+        "ruta": ruta,
+        "latencia_ms": round(latencia_ms, 1),
+        "fuentes": list(dict.fromkeys(id_fuente(d) for d in documentos)),
+        "cache": cache,
+    }
+    _iniciar_hilo()
+    try:
+        _cola.put_nowait(json.dumps(registro, ensure_ascii=False) + "\n")
+    except queue.Full:
+        _descartados += 1
+        if _descartados % 100 == 1:
+            print(f"⚠️ [query_log] Cola llena: {_descartados} registros descartados")
+
+
+def leer_registro(ruta=None):
+    """Itera los registros del archivo, saltando líneas corruptas (p. ej. una escritura cortada)."""
+    ruta = ruta or QUERY_LOG
+    if not os.path.exists(ruta):
+        return
+    with open(ruta, "r", encoding="utf-8") as f:
+        for linea in f:
+            try:
+                yield json.loads(linea)
+            except ValueError:
+                continue
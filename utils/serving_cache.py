@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, Optional
+from contextlib import contextmanager
+from langchain.docstore.document import Document
+from langchain_core.retrievers import BaseRetriever
+from utils.index_manifest import ARCHIVO_MANIFEST, huella_manifest, leer_manifest
+from utils.query_log import normalizar_pregunta
+from utils.vector_store import get_backend
+
+# ============================================================
+# Cachés de servicio (recuperación y respuestas)
+# ============================================================
+# Un archivo SQLite compartido por todos los procesos de la app.
+# La clave es (huella del índice, pregunta normalizada): al regenerar el
+# índice cambia la huella y las entradas anteriores dejan de usarse solas.
+# ├── recuperacion: fragmentos top-k de la base compartida (se llena en línea,
+# │                 con cada pregunta nueva; acotada por edad y cantidad de filas)
+# └── respuestas: respuestas precalculadas por el trabajo de calentamiento
+#                 (solo para primeras preguntas, sin historial; las acota el
+#                 propio calentamiento con sus preguntas más frecuentes)
+CACHE_DB = os.getenv("BECABOT_SERVING_CACHE", "knowledge_base/serving_cache.sqlite")
+CACHE_MAX_FILAS = int(os.getenv("BECABOT_CACHE_MAX_ROWS", "5000"))
+CACHE_TTL_SEGUNDOS = int(os.getenv("BECABOT_CACHE_TTL", str(7 * 24 * 3600)))
+# Tablas que se llenan en línea y se acotan al escribir
+TABLAS_ACOTADAS = ("recuperacion",)
+
+_lock = threading.Lock()
+_huella = None              # (ruta del manifiesto, mtime, huella)
+_esquemas = set()           # archivos con las tablas ya creadas en este proceso
+_local = threading.local()  # conexiones SQLite del hilo, por archivo
+
+
+def cache_habilitado():
+    return os.getenv("BECABOT_CACHE", "1") != "0"
+
+
+def huella_indice(persist_dir=None):
+    """Huella del índice vigente según su manifiesto (None si no tiene)."""
+    global _huella
+    ruta = os.path.join(persist_dir or get_backend().persist_dir, ARCHIVO_MANIFEST)
+    try:
+        mtime = os.stat(ruta).st_mtime_ns
+    except OSError:
+        return None
+    with _lock:
+        if _huella is None or _huella[:2] != (ruta, mtime):
+            manifest = leer_manifest(os.path.dirname(ruta))
+            _huella = (ruta, mtime, huella_manifest(manifest) if manifest else None)
+        return _huella[2]
+
+
+def _docs_a_json(docs):
+    return json.dumps([{"page_content": d.page_content, "metadata": d.metadata} for d in docs],
+                      ensure_ascii=False)
+
+
+def _json_a_docs(texto):
+    return [Document(page_content=d["page_content"], metadata=d["metadata"]) for d in json.loads(texto)]
+
+
+# ============================================================
+# Almacenamiento SQLite
+# ============================================================
+def _crear_esquema(conexion):
+    conexion.execute("PRAGMA journal_mode=WAL")
+    conexion.execute(
+        "CREATE TABLE IF NOT EXISTS recuperacion ("
+        "huella TEXT, pregunta TEXT, documentos TEXT, creado REAL, "
+        "PRIMARY KEY (huella, pregunta))"
+    )
+    conexion.execute("CREATE INDEX IF NOT EXISTS recuperacion_creado ON recuperacion (creado)")
+    conexion.execute(
+        "CREATE TABLE IF NOT EXISTS respuestas ("
+        "huella TEXT, pregunta TEXT, respuesta TEXT, documentos TEXT, creado REAL, "
+        "PRIMARY KEY (huella, pregunta))"
+    )
+    conexion.commit()
+
+
+def _conexion_del_hilo():
+    """
+    Conexión reutilizada por el hilo actual. El modo WAL y las tablas se
+    preparan una sola vez por archivo y proceso, fuera del camino de cada consulta.
+    """
+    conexiones = getattr(_local, "conexiones", None)
+    if conexiones is None:
+        conexiones = _local.conexiones = {}
+    conexion = conexiones.get(CACHE_DB)
+    if conexion is None:
+        directorio = os.path.dirname(CACHE_DB)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        conexion = sqlite3.connect(CACHE_DB, timeout=5)
+        with _lock:
+            if CACHE_DB not in _esquemas:
+                _crear_esquema(conexion)
+                _esquemas.add(CACHE_DB)
+        conexiones[CACHE_DB] = conexion
+    return conexion
+
+
+@contextmanager
+def _conexion():
+    """Conexión del hilo: confirma la transacción al salir (o la revierte si falla)."""
+    conexion = _conexion_del_hilo()
+    try:
+        with conexion:
+            yield conexion
+    except sqlite3.Error:
+        # Descartar la conexión (p. ej. archivo borrado): el próximo uso abre otra
+        _local.conexiones.pop(CACHE_DB, None)
+        with _lock:
+            _esquemas.discard(CACHE_DB)
+        conexion.close()
+        raise
+
+
+def _consultar(tabla, columnas, pregunta, huella):
+    if not cache_habilitado() or huella is None:
+        return None
+    # Las filas vencidas que aún no se borraron no cuentan como acierto
+    limite = time.time() - CACHE_TTL_SEGUNDOS if tabla in TABLAS_ACOTADAS else 0
+    try:
+        with _conexion() as conexion:
+            return conexion.execute(
+                f"SELECT {columnas} FROM {tabla} WHERE huella = ? AND pregunta = ? AND creado >= ?",
+                (huella, normalizar_pregunta(pregunta), limite),
+            ).fetchone()
+    except sqlite3.Error as e:
+        print(f"⚠️ [cache] Error al leer {CACHE_DB}: {e}")
+        return None
+
+
+def _guardar(tabla, valores, huella):
+    if not cache_habilitado() or huella is None:
+        return
+    marcadores = ", ".join("?" for _ in range(len(valores) + 2))
+    try:
+        with _conexion() as conexion:
+            conexion.execute(f"INSERT OR REPLACE INTO {tabla} VALUES ({marcadores})",
+                             (huella, *valores, time.time()))
+            if tabla in TABLAS_ACOTADAS:
+                _acotar(conexion, tabla)
+    except sqlite3.Error as e:
+        print(f"⚠️ [cache] Error al escribir {CACHE_DB}: {e}")
+
+
+def _acotar(conexion, tabla):
+    """Borra las filas vencidas y, sobre el tope, las más antiguas (usa el índice por fecha)."""
+    conexion.execute(f"DELETE FROM {tabla} WHERE creado < ?", (time.time() - CACHE_TTL_SEGUNDOS,))
+    conexion.execute(
+        f"DELETE FROM {tabla} WHERE rowid IN "
+        f"(SELECT rowid FROM {tabla} ORDER BY creado DESC LIMIT -1 OFFSET ?)",
+        (CACHE_MAX_FILAS,),
+    )
+
+
+def buscar_recuperacion(pregunta, huella=None):
+    fila = _consultar("recuperacion", "documentos", pregunta, huella or huella_indice())
+    return _json_a_docs(fila[0]) if fila else None
+
+
+def guardar_recuperacion(pregunta, documentos, huella=None):
+    _guardar("recuperacion", (normalizar_pregunta(pregunta), _docs_a_json(documentos)), huella or huella_indice())
+
+
+def buscar_respuesta(pregunta, huella=None):
+    """Devuelve (respuesta, documentos) precalculados o None."""
+    fila = _consultar("respuestas", "respuesta, documentos", pregunta, huella or huella_indice())
+    return (fila[0], _json_a_docs(fila[1])) if fila else None
+
+
+def guardar_respuesta(pregunta, respuesta, documentos, huella=None):
+    _guardar("respuestas", (normalizar_pregunta(pregunta), respuesta, _docs_a_json(documentos)),
+             huella or huella_indice())
+
+
+def purgar_obsoletas(huella):
+    """Elimina las entradas de índices anteriores. Devuelve cuántas filas borró."""
+    with _conexion() as conexion:
+        borradas = sum(
+            conexion.execute(f"DELETE FROM {tabla} WHERE huella != ?", (huella,)).rowcount
+            for tabla in ("recuperacion", "respuestas")
+        )
+    return borradas
+
+
+# ============================================================
+# Recuperador con caché
+# ============================================================
+MAX_ESTADOS = 1000
+
+
+class RetrieverCacheado(BaseRetriever):
+    """
+    Envuelve el recuperador de la base compartida: si la pregunta normalizada
+    ya se recuperó sobre el índice vigente, devuelve esos fragmentos sin
+    embeber la consulta ni buscar en la base vectorial.
+
+    Anota en `estados` si cada pregunta fue acierto ("recuperacion") o fallo
+    ("miss"), para que el registro de consultas lo lea después de la cadena
+    sin repetir la búsqueda en la caché.
+    """
+    base: BaseRetriever
+    persist_dir: Optional[str] = None
+    estados: Dict[str, str] = {}
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        huella = huella_indice(self.persist_dir)
+        documentos = buscar_recuperacion(query, huella)
+        estado = "recuperacion" if documentos is not None else "miss"
+        if documentos is None:
+            documentos = self.base.invoke(query, config={"callbacks": run_manager.get_child()})
+            guardar_recuperacion(query, documentos, huella)
+        self._anotar(query, estado)
+        return documentos
+
+    def _anotar(self, query, estado):
+        with _lock:
+            self.estados.pop(normalizar_pregunta(query), None)
+            self.estados[normalizar_pregunta(query)] = estado
+            if len(self.estados) > MAX_ESTADOS:
+                del self.estados[next(iter(self.estados))]
+
+    def estado(self, pregunta):
+        """Resultado de la caché en la última recuperación de la pregunta (o None)."""
+        with _lock:
+            return self.estados.get(normalizar_pregunta(pregunta))
@@ -0,0 +1,183 @@
+import os
+import time
+import tempfile
+import threading
+from typing import Any
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.retrievers import BaseRetriever
+from utils.prepare_vectordb import get_embedding_model, get_text_chunks
+from utils.vector_store import NumpyVectorStore
+
+# ============================================================
+# Índice efímero por sesión para PDFs subidos por el usuario
+# ============================================================
+# Los PDFs de "Procesar PDFs" se indexan solo en la sesión que los subió,
+# en memoria y con vencimiento. La base compartida no cambia hasta que el
+# usuario los publique explícitamente.
+OVERLAY_TTL_SEGUNDOS = int(os.getenv("BECABOT_OVERLAY_TTL", "3600"))
+
+# Constante de Reciprocal Rank Fusion (valor estándar de la literatura)
+RRF_K = 60
+
+# Similitud coseno mínima de un fragmento del overlay para entrar en la fusión.
+# RRF solo mira el rango: sin este piso, el overlay ocuparía ~k/2 lugares
+# aunque sus PDFs no tengan nada que ver con la pregunta.
+SIMILITUD_MINIMA_OVERLAY = float(os.getenv("BECABOT_OVERLAY_MIN_SCORE", "0.30"))
+
+# Los overlays tienen embeddings y no van al almacén de sesiones: quedan en el
+# proceso que los indexó, registrados por id de sesión (?sid=) para que una
+# recarga del navegador en el mismo worker los recupere.
+_overlays = {}
+_lock_overlays = threading.Lock()
+
+
+class OverlayIndex:
+    """
+    Índice en memoria con los PDFs subidos en una sesión.
+
+    Atributos:
+    ├── store: NumpyVectorStore sin persistencia
+    ├── documentos: nombres de los PDFs indexados
+    ├── ultimo_uso: marca de tiempo para el vencimiento (TTL)
+    └── cadena: (vectordb, cadena RAG, recuperador) de la sesión, creada por
+        chatbot.obtener_cadena; vive y se libera junto con el overlay
+    """
+
+    def __init__(self, ttl=OVERLAY_TTL_SEGUNDOS):
+        self.store = NumpyVectorStore(get_embedding_model())
+        self.documentos = []
+        self.ttl = ttl
+        self.ultimo_uso = time.time()
+        self.cadena = None
+
+    def __len__(self):
+        return len(self.store)
+
+    def tocar(self):
+        self.ultimo_uso = time.time()
+
+    def expirado(self):
+        return time.time() - self.ultimo_uso > self.ttl
+
+    def liberar(self):
+        """Suelta la cadena (que referencia al overlay) para liberar ambos de inmediato."""
+        self.cadena = None
+
+    def minutos_restantes(self):
+        return max(0, int((self.ttl - (time.time() - self.ultimo_uso)) // 60))
+
+    def agregar_pdfs(self, pdf_docs):
+        """
+        Extrae, fragmenta y embebe solo los PDFs subidos (archivos de st.file_uploader).
+        Devuelve los nombres de los PDFs agregados.
+        """
+        nuevos = [pdf for pdf in pdf_docs if pdf.name not in self.documentos]
+        docs = []
+        for pdf in nuevos:
+            # PyPDFLoader necesita una ruta: archivo temporal fuera de docs/
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+                tmp.write(pdf.getvalue())
+                ruta_tmp = tmp.name
+            try:
+                paginas = PyPDFLoader(ruta_tmp).load()
+            except Exception as e:
+                print(f"⚠️ Error al procesar {pdf.name}: {e}")
+                continue
+            finally:
+                os.remove(ruta_tmp)
+
+            for pagina in paginas:
+                pagina.metadata["source"] = pdf.name
+                pagina.metadata["sesion"] = True
+            docs.extend(paginas)
+            self.documentos.append(pdf.name)
+
+        if docs:
+            chunks = get_text_chunks(docs)
+            self.store.add_documents(chunks)
+            print(f"Overlay de sesión: {len(chunks)} fragmentos de {len(docs)} páginas.")
+        self.tocar()
+        return [pdf.name for pdf in nuevos if pdf.name in self.documentos]
+
+    def quitar_pdfs(self, nombres):
+        """Elimina del overlay los PDFs indicados (p. ej. tras publicarlos en la base compartida)."""
+        nombres = set(nombres)
+        ids = [id_ for id_, metadata in zip(self.store._ids, self.store._metadatos)
+               if metadata.get("source") in nombres]
+        self.store.delete(ids)
+        self.documentos = [d for d in self.documentos if d not in nombres]
+
+
+# ============================================================
+# Recuperador combinado: base compartida + overlay de sesión
+# ============================================================
+def _clave_documento(doc):
+    return (doc.page_content, doc.metadata.get("source"), doc.metadata.get("page"))
+
+
+class RetrieverCombinado(BaseRetriever):
+    """
+    Fusiona los resultados de la base compartida y del overlay de la sesión
+    con Reciprocal Rank Fusion, que no depende de que ambos índices usen la
+    misma escala de puntajes. Del overlay solo entran los fragmentos con
+    similitud >= similitud_minima, para que PDFs ajenos a la pregunta no
+    desplacen a los buenos resultados de la base compartida.
+    """
+    base: BaseRetriever
+    overlay: Any
+    k: int = 15
+    similitud_minima: float = SIMILITUD_MINIMA_OVERLAY
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        resultados = [self.base.invoke(query, config={"callbacks": run_manager.get_child()})]
+        if self.overlay is not None and len(self.overlay) > 0 and not self.overlay.expirado():
+            self.overlay.tocar()
+            resultados.append([
+                doc for doc, similitud in self.overlay.store.similarity_search_with_score(query, k=self.k)
+                if similitud >= self.similitud_minima
+            ])
+
+        puntajes = {}
+        documentos = {}
+        for lista in resultados:
+            for rango, doc in enumerate(lista):
+                clave = _clave_documento(doc)
+                documentos.setdefault(clave, doc)
+                puntajes[clave] = puntajes.get(clave, 0.0) + 1.0 / (RRF_K + rango + 1)
+
+        orden = sorted(puntajes, key=puntajes.get, reverse=True)
+        return [documentos[clave] for clave in orden[:self.k]]
+
+
+# ============================================================
+# Registro de overlays del proceso
+# ============================================================
+def overlay_de_sesion(sid):
+    """Overlay vigente de la sesión en este proceso, o None."""
+    with _lock_overlays:
+        overlay = _overlays.get(sid)
+        if overlay is not None and overlay.expirado():
+            del _overlays[sid]
+            overlay.liberar()
+            overlay = None
+    return overlay
+
+
+def registrar_overlay(sid, overlay):
+    """Asocia el overlay a la sesión y libera los overlays vencidos de otras sesiones."""
+    with _lock_overlays:
+        for otro in [s for s, o in _overlays.items() if o.expirado()]:
+            _overlays.pop(otro).liberar()
+        if sid is not None:
+            _overlays[sid] = overlay
+
+
+def limpiar_overlay_expirado(st):
+    """Descarta el overlay vencido de la sesión. Devuelve True si se descartó."""
+    overlay = st.session_state.get("overlay_index")
+    if overlay is None or not overlay.expirado():
+        return False
+    overlay_de_sesion(st.session_state.get("session_id"))
+    overlay.liberar()
+    st.session_state.overlay_index = None
+    return True
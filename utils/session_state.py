@@ -1,5 +1,6 @@
 import os
-from utils.prepare_vectordb import get_vectorstore
+from utils.session_overlay import overlay_de_sesion
+from utils.session_store import restaurar_sesion
 
 def initialize_session_state_variables(st):
     """
@@ -9,31 +10,42 @@ def initialize_session_state_variables(st):
     - st: objeto Streamlit (para acceder a st.session_state)
 
     Variables inicializadas:
+    ├── session_id: id de la sesión (?sid= en la URL) en el almacén de sesiones
     ├── chat_history: historial de conversación (lista de mensajes)
     ├── uploaded_pdfs: PDFs subidos por el usuario (lista de archivos)
     ├── processed_documents: PDFs ya procesados en la base vectorial
-    ├── vectordb: instancia persistente de la base vectorial (Chroma)
+    ├── overlay_index: índice efímero con los PDFs subidos en esta sesión
     └── previous_upload_docs_length: cantidad de documentos previos
+
+    chat_history y uploaded_pdfs se restauran del almacén de sesiones si la
+    conversación empezó en otro worker o antes de recargar la página.
+
+    La base vectorial y la cadena RAG no se guardan en la sesión: se piden al
+    proceso en cada ejecución (get_vectorstore / obtener_cadena) para que todas
+    las sesiones usen el índice vigente aunque otra lo haya regenerado.
     """
 
     # --- 1 Asegurar carpeta 'docs' ---
     if not os.path.exists("docs"):
         os.makedirs("docs")
 
-    # --- 2 Leer archivos existentes ---
+    # --- 2 Restaurar el estado guardado de la sesión (si existe) ---
+    restaurar_sesion(st)
+
+    # --- 3 Leer archivos existentes ---
     upload_docs = os.listdir("docs")
 
-    # --- 3 Variables necesarias ---
+    # --- 4 Variables necesarias ---
     variables = [
         "chat_history",
         "uploaded_pdfs",
         "processed_documents",
-        "vectordb",
         "previous_upload_docs_length",
         "voice_query",
+        "overlay_index",
     ]
 
-    # --- 4 Inicializar si no existen ---
+    # --- 5 Inicializar si no existen ---
     for var in variables:
         if var not in st.session_state:
             if var == "chat_history":
@@ -46,11 +58,6 @@ def initialize_session_state_variables(st):
                 st.session_state.previous_upload_docs_length = len(upload_docs)
             elif var == "voice_query":
                 st.session_state.voice_query = None
-            elif var == "vectordb":
-                try:
-                    # Intenta cargar una base vectorial existente
-                    st.session_state.vectordb = get_vectorstore(upload_docs, from_session_state=True)
-                except Exception as e:
-                    st.warning(f"⚠️ No se pudo cargar la base vectorial existente: {e}")
-                    st.session_state.vectordb = None
+            elif var == "overlay_index":
+                st.session_state.overlay_index = overlay_de_sesion(st.session_state.session_id)
 
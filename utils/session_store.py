@@ -0,0 +1,305 @@
+import os
+import re
+import json
+import time
+import zlib
+import sqlite3
+import secrets
+import hashlib
+import threading
+from contextlib import closing, contextmanager
+from langchain_core.messages import AIMessage, HumanMessage
+
+# ============================================================
+# Almacén de sesiones fuera del proceso de Streamlit
+# ============================================================
+# st.session_state vive dentro de un proceso: sin un almacén externo, un
+# balanceador tiene que mandar siempre al mismo usuario al mismo worker.
+# Aquí se guarda solo el estado liviano de la conversación, comprimido:
+# ├── chat_history: [["h"|"a", texto], ...]
+# └── uploaded_pdfs: nombres de los PDFs subidos
+#
+# Lo pesado (base vectorial, modelo de embeddings, cadena RAG) no se guarda
+# por sesión: se resuelve desde instancias compartidas por el proceso.
+# La sesión se identifica con el parámetro ?sid= de la URL:
+# ├── el sid es la única credencial: quien recibe el enlace con ?sid= restaura
+# │   la conversación completa, así que la URL no debe compartirse
+# ├── lo genera el servidor con `secrets` (no se puede adivinar) y un sid de la
+# │   URL que no esté en el almacén se reemplaza por uno nuevo, de modo que
+# │   nadie puede fijar de antemano el sid de otra persona
+# └── cada estado guardado tiene una versión: si dos pestañas abren la misma
+#     URL, la que escribe con una versión vieja no pisa a la otra, sino que
+#     sigue en un sid propio con su copia de la conversación
+PARAMETRO_SESION = "sid"
+SESSION_TTL_SEGUNDOS = int(os.getenv("BECABOT_SESSION_TTL", str(24 * 3600)))
+INTERVALO_PURGA = 600
+CAMPOS_PERSISTENTES = ("chat_history", "uploaded_pdfs")
+
+BYTES_SID = 24      # 32 caracteres en base64 para URL
+# Incluye los sid hexadecimales de 32 caracteres de versiones anteriores
+_FORMATO_SID = re.compile(r"^[A-Za-z0-9_-]{32}$")
+
+
+# ============================================================
+# Serialización compacta
+# ============================================================
+def serializar_estado(session_state):
+    """Estado persistente de la sesión como JSON comprimido (bytes)."""
+    estado = {
+        "chat_history": [
+            ["a" if isinstance(m, AIMessage) else "h", m.content]
+            for m in session_state.get("chat_history") or []
+        ],
+        "uploaded_pdfs": list(session_state.get("uploaded_pdfs") or []),
+    }
+    texto = json.dumps(estado, ensure_ascii=False, separators=(",", ":"))
+    return zlib.compress(texto.encode("utf-8"))
+
+
+def deserializar_estado(datos):
+    estado = json.loads(zlib.decompress(datos).decode("utf-8"))
+    estado["chat_history"] = [
+        AIMessage(content=texto) if rol == "a" else HumanMessage(content=texto)
+        for rol, texto in estado.get("chat_history", [])
+    ]
+    return estado
+
+
+# ============================================================
+# Backends
+# ============================================================
+class SessionStore:
+    """
+    Almacén de estados serializados por id de sesión.
+
+    Métodos:
+    - cargar(sid): (bytes guardados, versión) o None (también si vencieron)
+    - guardar(sid, datos, version): escribe solo si la versión guardada sigue
+      siendo `version` (0 = sesión nueva o vencida); devuelve la nueva versión
+      o None si otro escritor la cambió antes
+    - eliminar(sid)
+    """
+    nombre = "base"
+
+    def __init__(self, ttl=SESSION_TTL_SEGUNDOS):
+        self.ttl = ttl
+        self._ultima_purga = time.time()
+
+    def cargar(self, sid):
+        raise NotImplementedError
+
+    def guardar(self, sid, datos, version=0):
+        raise NotImplementedError
+
+    def eliminar(self, sid):
+        raise NotImplementedError
+
+    def _purgar(self, limite):
+        raise NotImplementedError
+
+    def _vigente(self, actualizado):
+        return time.time() - actualizado <= self.ttl
+
+    def _purgar_si_toca(self):
+        if time.time() - self._ultima_purga > INTERVALO_PURGA:
+            self._ultima_purga = time.time()
+            self._purgar(time.time() - self.ttl)
+
+
+class MemorySessionStore(SessionStore):
+    """Diccionario del proceso: sobrevive a recargas del navegador, no a otro worker."""
+    nombre = "memory"
+
+    def __init__(self, ttl=SESSION_TTL_SEGUNDOS):
+        super().__init__(ttl)
+        self._lock = threading.Lock()
+        self._sesiones = {}     # sid -> (última escritura, versión, datos)
+
+    def cargar(self, sid):
+        with self._lock:
+            guardado = self._sesiones.get(sid)
+        if guardado is None or not self._vigente(guardado[0]):
+            return None
+        return guardado[2], guardado[1]
+
+    def guardar(self, sid, datos, version=0):
+        with self._lock:
+            guardado = self._sesiones.get(sid)
+            actual = guardado[1] if guardado is not None and self._vigente(guardado[0]) else 0
+            if actual != version:
+                return None
+            # La versión sigue creciendo aunque la sesión anterior haya vencido
+            nueva = (guardado[1] if guardado is not None else 0) + 1
+            self._sesiones[sid] = (time.time(), nueva, datos)
+        self._purgar_si_toca()
+        return nueva
+
+    def eliminar(self, sid):
+        with self._lock:
+            self._sesiones.pop(sid, None)
+
+    def _purgar(self, limite):
+        with self._lock:
+            for sid in [s for s, (ts, _, _) in self._sesiones.items() if ts < limite]:
+                del self._sesiones[sid]
+
+
+class SQLiteSessionStore(SessionStore):
+    """Archivo SQLite compartido por todos los workers del nodo (modo WAL)."""
+    nombre = "sqlite"
+
+    def __init__(self, ruta=None, ttl=SESSION_TTL_SEGUNDOS):
+        super().__init__(ttl)
+        self.ruta = ruta or os.getenv("BECABOT_SESSION_DB", "knowledge_base/sessions.sqlite")
+        directorio = os.path.dirname(self.ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        with self._conectar() as conexion:
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS sesiones "
+                "(sid TEXT PRIMARY KEY, estado BLOB, actualizado REAL, version INTEGER NOT NULL DEFAULT 0)"
+            )
+            # Archivos creados antes de versionar las escrituras
+            columnas = {fila[1] for fila in conexion.execute("PRAGMA table_info(sesiones)")}
+            if "version" not in columnas:
+                conexion.execute("ALTER TABLE sesiones ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+    @contextmanager
+    def _conectar(self):
+        """Conexión de corta duración: confirma la transacción y se cierra al salir."""
+        with closing(sqlite3.connect(self.ruta, timeout=5)) as conexion, conexion:
+            yield conexion
+
+    def cargar(self, sid):
+        with self._conectar() as conexion:
+            fila = conexion.execute(
+                "SELECT estado, version FROM sesiones WHERE sid = ? AND actualizado >= ?",
+                (sid, time.time() - self.ttl),
+            ).fetchone()
+        return (fila[0], fila[1]) if fila else None
+
+    def guardar(self, sid, datos, version=0):
+        with self._conectar() as conexion:
+            # Compare-and-set: la lectura y la escritura van en la misma transacción
+            conexion.execute("BEGIN IMMEDIATE")
+            fila = conexion.execute(
+                "SELECT version, actualizado FROM sesiones WHERE sid = ?", (sid,)
+            ).fetchone()
+            actual = fila[0] if fila is not None and self._vigente(fila[1]) else 0
+            if actual != version:
+                return None
+            nueva = (fila[0] if fila is not None else 0) + 1
+            conexion.execute(
+                "INSERT OR REPLACE INTO sesiones (sid, estado, actualizado, version) VALUES (?, ?, ?, ?)",
+                (sid, datos, time.time(), nueva),
+            )
+        self._purgar_si_toca()
+        return nueva
+
+    def eliminar(self, sid):
+        with self._conectar() as conexion:
+            conexion.execute("DELETE FROM sesiones WHERE sid = ?", (sid,))
+
+    def _purgar(self, limite):
+        with self._conectar() as conexion:
+            conexion.execute("DELETE FROM sesiones WHERE actualizado < ?", (limite,))
+
+
+STORES = {
+    MemorySessionStore.nombre: MemorySessionStore,
+    SQLiteSessionStore.nombre: SQLiteSessionStore,
+}
+
+_stores = {}
+_lock_stores = threading.Lock()
+
+
+def get_session_store(nombre=None):
+    """
+    Almacén de sesiones compartido por el proceso ('memory' o 'sqlite').
+    Sin nombre, usa la variable de entorno BECABOT_SESSION_STORE (por defecto 'memory').
+    """
+    nombre = nombre or os.getenv("BECABOT_SESSION_STORE", "memory")
+    if nombre not in STORES:
+        raise ValueError(f"Almacén de sesiones desconocido: {nombre}. Opciones: {', '.join(STORES)}")
+    with _lock_stores:
+        if nombre not in _stores:
+            _stores[nombre] = STORES[nombre]()
+        return _stores[nombre]
+
+
+# ============================================================
+# Integración con Streamlit
+# ============================================================
+def nuevo_id_sesion(st):
+    """Genera un sid en el servidor y lo publica en ?sid= de la URL."""
+    sid = secrets.token_urlsafe(BYTES_SID)
+    st.query_params[PARAMETRO_SESION] = sid
+    return sid
+
+
+def id_sesion(st):
+    """Id de sesión desde ?sid= de la URL; si falta o no es válido, se crea uno nuevo."""
+    sid = st.query_params.get(PARAMETRO_SESION)
+    if not sid or not _FORMATO_SID.match(sid):
+        sid = nuevo_id_sesion(st)
+    return sid
+
+
+def _huella(datos):
+    return hashlib.sha1(datos).hexdigest()
+
+
+def restaurar_sesion(st):
+    """
+    Carga el estado guardado en st.session_state una sola vez por sesión de Streamlit.
+    Devuelve True si había un estado guardado. Un sid que no está en el
+    almacén (inventado, vencido o ilegible) se reemplaza por uno nuevo.
+    """
+    if "session_id" in st.session_state:
+        return False
+    sid = id_sesion(st)
+    try:
+        guardado = get_session_store().cargar(sid)
+    except Exception as e:
+        print(f"⚠️ [sesiones] No se pudo cargar la sesión {sid}: {e}")
+        guardado = None
+    st.session_state._version_sesion = 0
+    if guardado is None:
+        st.session_state.session_id = nuevo_id_sesion(st)
+        return False
+
+    datos, st.session_state._version_sesion = guardado
+    st.session_state.session_id = sid
+    for campo, valor in deserializar_estado(datos).items():
+        if campo in CAMPOS_PERSISTENTES:
+            st.session_state[campo] = valor
+    st.session_state._huella_sesion = _huella(datos)
+    return True
+
+
+def guardar_sesion(st):
+    """
+    Guarda el estado de la sesión en el almacén si cambió desde la última escritura.
+    Si otra pestaña con el mismo sid escribió antes, esta sigue en un sid nuevo
+    en lugar de pisar esa conversación.
+    """
+    sid = st.session_state.get("session_id")
+    if sid is None:
+        return
+    datos = serializar_estado(st.session_state)
+    huella = _huella(datos)
+    if st.session_state.get("_huella_sesion") == huella:
+        return
+    try:
+        store = get_session_store()
+        version = store.guardar(sid, datos, st.session_state.get("_version_sesion", 0))
+        if version is None:
+            sid = nuevo_id_sesion(st)
+            st.session_state.session_id = sid
+            version = store.guardar(sid, datos, 0)
+        st.session_state._version_sesion = version
+        st.session_state._huella_sesion = huella
+    except Exception as e:
+        print(f"⚠️ [sesiones] No se pudo guardar la sesión {sid}: {e}")
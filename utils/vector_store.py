@@ -0,0 +1,658 @@
+import os
+import json
+import uuid
+import shutil
+import numpy as np
+from langchain_community.vectorstores import Chroma
+from langchain_core.vectorstores import VectorStore
+from langchain.docstore.document import Document
+import chromadb
+from utils.index_manifest import guardar_manifest, leer_manifest
+from utils.quantizers import get_cuantizador, CUANTIZADORES
+
+# ============================================================
+# Vector store en memoria mapeada (NumPy) para corpus pequeños
+# ============================================================
+class NumpyVectorStore(VectorStore):
+    """
+    Vector store exacto sobre una matriz NumPy de embeddings normalizados.
+
+    En disco (persist_dir):
+    ├── vectors.npy: matriz N x D (float32 o float16), se abre con mmap de solo lectura
+    ├── metadata.jsonl: tabla lateral, una fila por vector {"id", "text", "metadata"}
+    ├── config.json: dtype, dimensión, cantidad de vectores y codificación
+    ├── codes.npy: códigos comprimidos (solo con codificación int8/pq)
+    └── quantizer.npz: parámetros del cuantizador (solo con codificación)
+
+    Sin codificación la búsqueda es exacta: un único producto matriz-vector
+    (BLAS) seguido de un top-k parcial. Con codificación, el puntaje aproximado
+    recorre solo los códigos y los `rescore * k` mejores candidatos se vuelven
+    a puntuar contra los vectores completos (que casi no se leen del disco).
+    Sin rescore explícito se usa el del cuantizador (4 para int8, 16 para pq).
+    Como los archivos se abren con mmap, varios procesos worker comparten las
+    mismas páginas de solo lectura del page cache del sistema.
+    Sin persist_dir, el store vive solo en memoria.
+    """
+
+    ARCHIVO_VECTORES = "vectors.npy"
+    ARCHIVO_METADATOS = "metadata.jsonl"
+    ARCHIVO_CONFIG = "config.json"
+    ARCHIVO_CODIGOS = "codes.npy"
+    ARCHIVO_CUANTIZADOR = "quantizer.npz"
+    # Filas por bloque al convertir float16 -> float32 durante la búsqueda
+    TAMANO_BLOQUE = 8192
+
+    def __init__(self, embedding, persist_dir=None, dtype="float32", codificacion=None, rescore=None):
+        self._embedding = embedding
+        self.persist_dir = persist_dir
+        self.dtype = np.dtype(dtype)
+        self.codificacion = codificacion if codificacion != "none" else None
+        self.rescore = rescore
+        self._cuantizador = None
+        self._codigos = None
+        self._matriz = None
+        self._ids = []
+        self._textos = []
+        self._metadatos = []
+
+        if persist_dir and os.path.exists(os.path.join(persist_dir, self.ARCHIVO_VECTORES)):
+            self._cargar()
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def __len__(self):
+        return len(self._ids)
+
+    # --------------------------------------------------------
+    # Persistencia
+    # --------------------------------------------------------
+    def _ruta(self, archivo):
+        return os.path.join(self.persist_dir, archivo)
+
+    def _cargar(self):
+        with open(self._ruta(self.ARCHIVO_CONFIG), "r", encoding="utf-8") as f:
+            config = json.load(f)
+        self.dtype = np.dtype(config["dtype"])
+        self._matriz = np.load(self._ruta(self.ARCHIVO_VECTORES), mmap_mode="r")
+
+        codificacion = config.get("encoding")
+        if codificacion:
+            self.codificacion = codificacion["name"]
+            with np.load(self._ruta(self.ARCHIVO_CUANTIZADOR)) as parametros:
+                self._cuantizador = CUANTIZADORES[codificacion["type"]].desde_parametros(dict(parametros))
+            self._codigos = np.load(self._ruta(self.ARCHIVO_CODIGOS), mmap_mode="r")
+        else:
+            self.codificacion = None
+
+        with open(self._ruta(self.ARCHIVO_METADATOS), "r", encoding="utf-8") as f:
+            for linea in f:
+                fila = json.loads(linea)
+                self._ids.append(fila["id"])
+                self._textos.append(fila["text"])
+                self._metadatos.append(fila["metadata"])
+
+    def _guardar(self):
+        """
+        Escritura atómica por archivo: temporales + os.replace. Los backends
+        escriben cada construcción en un directorio propio (ver BackendNumpy),
+        así que nadie lee estos archivos hasta que el manifiesto los apunta.
+        """
+        os.makedirs(self.persist_dir, exist_ok=True)
+
+        if self._matriz is None:
+            self._matriz = np.zeros((0, 0), dtype=self.dtype)
+
+        tmp_vectores = self._ruta(self.ARCHIVO_VECTORES + ".tmp")
+        with open(tmp_vectores, "wb") as f:
+            np.save(f, self._matriz)
+
+        tmp_metadatos = self._ruta(self.ARCHIVO_METADATOS + ".tmp")
+        with open(tmp_metadatos, "w", encoding="utf-8") as f:
+            for id_, texto, metadata in zip(self._ids, self._textos, self._metadatos):
+                f.write(json.dumps({"id": id_, "text": texto, "metadata": metadata}, ensure_ascii=False) + "\n")
+
+        config = {
+            "dtype": self.dtype.name,
+            "dim": int(self._matriz.shape[1]),
+            "count": len(self._ids),
+        }
+        if self._asegurar_codigos():
+            tmp_codigos = self._ruta(self.ARCHIVO_CODIGOS + ".tmp")
+            with open(tmp_codigos, "wb") as f:
+                np.save(f, np.asarray(self._codigos))
+            tmp_cuantizador = self._ruta(self.ARCHIVO_CUANTIZADOR + ".tmp")
+            with open(tmp_cuantizador, "wb") as f:
+                np.savez(f, **self._cuantizador.parametros())
+            config["encoding"] = {"name": self.codificacion, **self._cuantizador.descripcion()}
+
+        tmp_config = self._ruta(self.ARCHIVO_CONFIG + ".tmp")
+        with open(tmp_config, "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2)
+
+        os.replace(tmp_vectores, self._ruta(self.ARCHIVO_VECTORES))
+        os.replace(tmp_metadatos, self._ruta(self.ARCHIVO_METADATOS))
+        if "encoding" in config:
+            os.replace(tmp_codigos, self._ruta(self.ARCHIVO_CODIGOS))
+            os.replace(tmp_cuantizador, self._ruta(self.ARCHIVO_CUANTIZADOR))
+        os.replace(tmp_config, self._ruta(self.ARCHIVO_CONFIG))
+
+        # Reabrir en modo mmap para liberar la copia en memoria
+        self._matriz = np.load(self._ruta(self.ARCHIVO_VECTORES), mmap_mode="r")
+        if "encoding" in config:
+            self._codigos = np.load(self._ruta(self.ARCHIVO_CODIGOS), mmap_mode="r")
+
+    def _asegurar_codigos(self):
+        """
+        Entrena el cuantizador y codifica la matriz si hace falta (los códigos se
+        invalidan con cada cambio). Devuelve False si el store no usa codificación.
+        """
+        if not self.codificacion or len(self._ids) == 0:
+            return False
+        if self._codigos is None:
+            matriz = np.asarray(self._matriz, dtype=np.float32)
+            self._cuantizador = get_cuantizador(self.codificacion).entrenar(matriz)
+            self._codigos = self._cuantizador.codificar(matriz)
+        return True
+
+    # --------------------------------------------------------
+    # Escritura
+    # --------------------------------------------------------
+    @staticmethod
+    def _normalizar(vectores):
+        vectores = np.asarray(vectores, dtype=np.float32)
+        normas = np.linalg.norm(vectores, axis=-1, keepdims=True)
+        return vectores / np.maximum(normas, 1e-12)
+
+    def agregar_embeddings(self, textos, embeddings, metadatos=None, ids=None):
+        """
+        Inserta (o reemplaza por id) vectores ya calculados.
+        Devuelve la lista de ids insertados.
+        """
+        textos = list(textos)
+        metadatos = list(metadatos) if metadatos else [{} for _ in textos]
+        if ids is None:
+            ids = [uuid.uuid4().hex for _ in textos]
+        ids = [str(i) for i in ids]
+
+        nuevos = self._normalizar(embeddings).astype(self.dtype)
+
+        # Upsert: las filas con ids existentes se eliminan antes de agregar
+        self._eliminar_filas(set(ids))
+
+        if self._matriz is None or len(self._ids) == 0:
+            self._matriz = nuevos
+        else:
+            self._matriz = np.concatenate([np.asarray(self._matriz), nuevos])
+        self._codigos = None
+        self._ids.extend(ids)
+        self._textos.extend(textos)
+        self._metadatos.extend(metadatos)
+
+        if self.persist_dir:
+            self._guardar()
+        return ids
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        embeddings = self._embedding.embed_documents(texts)
+        return self.agregar_embeddings(texts, embeddings, metadatas, ids)
+
+    def _eliminar_filas(self, ids):
+        if not ids or self._matriz is None:
+            return
+        conservar = [i for i, id_ in enumerate(self._ids) if id_ not in ids]
+        if len(conservar) == len(self._ids):
+            return
+        self._matriz = np.asarray(self._matriz)[conservar]
+        self._codigos = None
+        self._ids = [self._ids[i] for i in conservar]
+        self._textos = [self._textos[i] for i in conservar]
+        self._metadatos = [self._metadatos[i] for i in conservar]
+
+    def delete(self, ids=None, **kwargs):
+        if not ids:
+            return False
+        antes = len(self._ids)
+        self._eliminar_filas(set(map(str, ids)))
+        if self.persist_dir and len(self._ids) != antes:
+            self._guardar()
+        return True
+
+    # --------------------------------------------------------
+    # Búsqueda
+    # --------------------------------------------------------
+    @staticmethod
+    def _cumple_filtro(metadata, filtro):
+        """Filtro estilo Chroma: {"campo": valor} o {"campo": {"$in": [...]}}."""
+        for campo, condicion in filtro.items():
+            valor = metadata.get(campo)
+            if isinstance(condicion, dict):
+                if "$in" in condicion and valor not in condicion["$in"]:
+                    return False
+                if "$ne" in condicion and valor == condicion["$ne"]:
+                    return False
+                if "$eq" in condicion and valor != condicion["$eq"]:
+                    return False
+            elif valor != condicion:
+                return False
+        return True
+
+    def _producto(self, filas, consulta):
+        """Similitud coseno de la consulta contra las filas (matriz o submatriz)."""
+        if filas.dtype == np.float32:
+            return filas @ consulta
+        # float16: convertir por bloques para usar BLAS sin duplicar toda la matriz
+        puntajes = np.empty(filas.shape[0], dtype=np.float32)
+        for inicio in range(0, filas.shape[0], self.TAMANO_BLOQUE):
+            bloque = np.asarray(filas[inicio:inicio + self.TAMANO_BLOQUE], dtype=np.float32)
+            puntajes[inicio:inicio + len(bloque)] = bloque @ consulta
+        return puntajes
+
+    @staticmethod
+    def _top(puntajes, k):
+        """Posiciones de los k mayores puntajes, ordenadas de mayor a menor."""
+        k = min(k, len(puntajes))
+        mejores = np.argpartition(-puntajes, k - 1)[:k]
+        return mejores[np.argsort(-puntajes[mejores])]
+
+    def buscar_por_vector(self, vector, k=4, filter=None):
+        """Top-k: devuelve [(indice_fila, similitud)] ordenado de mayor a menor."""
+        if self._matriz is None or len(self._ids) == 0:
+            return []
+        consulta = self._normalizar(vector)
+
+        filas = None
+        if filter:
+            filas = np.array(
+                [i for i, m in enumerate(self._metadatos) if self._cumple_filtro(m, filter)],
+                dtype=np.int64,
+            )
+            if len(filas) == 0:
+                return []
+
+        if self._asegurar_codigos():
+            # Puntaje aproximado sobre los códigos y reordenamiento exacto de los candidatos
+            codigos = self._codigos if filas is None else self._codigos[filas]
+            aproximados = self._cuantizador.puntajes(codigos, consulta)
+            rescore = self.rescore if self.rescore is not None else self._cuantizador.RESCORE_DEFAULT
+            posiciones = self._top(aproximados, k * max(rescore, 1))
+            candidatos = posiciones if filas is None else filas[posiciones]
+            if not rescore:
+                return [(int(c), float(aproximados[p])) for c, p in zip(candidatos, posiciones)]
+            # Lectura ordenada de las pocas filas completas que hacen falta
+            candidatos = np.sort(candidatos)
+            puntajes = self._producto(self._matriz[candidatos], consulta)
+            mejores = self._top(puntajes, k)
+            return [(int(candidatos[m]), float(puntajes[m])) for m in mejores]
+
+        if filas is not None:
+            puntajes = self._producto(self._matriz[filas], consulta)
+        else:
+            puntajes = self._producto(self._matriz, consulta)
+
+        mejores = self._top(puntajes, k)
+        resultado = filas[mejores] if filas is not None else mejores
+        return [(int(f), float(puntajes[m])) for f, m in zip(resultado, mejores)]
+
+    def _documento(self, fila):
+        return Document(page_content=self._textos[fila], metadata=dict(self._metadatos[fila]))
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, filter=None, **kwargs):
+        return [(self._documento(f), s) for f, s in self.buscar_por_vector(embedding, k, filter)]
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        vector = self._embedding.embed_query(query)
+        return self.similarity_search_by_vector_with_score(vector, k, filter)
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        # Los puntajes ya son similitud coseno (mayor es mejor)
+        return lambda similitud: similitud
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, persist_dir=None, dtype="float32",
+                   codificacion=None, **kwargs):
+        store = cls(embedding, persist_dir=persist_dir, dtype=dtype, codificacion=codificacion)
+        if texts:
+            store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+
+# ============================================================
+# Interfaz de backends para get_vectorstore
+# ============================================================
+def _chroma_settings():
+    return chromadb.config.Settings(
+        anonymized_telemetry=False,
+        allow_reset=True,
+        chroma_telemetry_impl="none"
+    )
+
+
+class BackendVectorial:
+    """
+    Backend de almacenamiento de la base vectorial.
+
+    Métodos:
+    - existe(): si hay un índice persistido en persist_dir
+    - cargar(embedding): abre el índice existente
+    - construir(chunks, embedding): crea el índice a partir de los fragmentos
+    - publicar(manifest): hace vigente lo construido guardando su manifiesto
+    - abrir_escritura(desde_cero): escritor incremental con embeddings precalculados
+      (ingesta); parte del índice vigente o, con desde_cero, de un índice vacío
+    """
+    nombre = "base"
+    persist_dir = None
+    codificacion = None     # compresión de los vectores (se registra en el manifiesto)
+
+    def existe(self):
+        return os.path.exists(self.persist_dir)
+
+    def cargar(self, embedding):
+        raise NotImplementedError
+
+    def construir(self, chunks, embedding):
+        raise NotImplementedError
+
+    def publicar(self, manifest):
+        """
+        El manifiesto es el puntero al índice vigente: las sesiones y los demás
+        workers comparan su built_at y reabren el índice cuando cambia.
+        """
+        guardar_manifest(self.persist_dir, manifest)
+
+    def abrir_escritura(self, desde_cero=False):
+        raise NotImplementedError
+
+
+class EscritorVectorial:
+    """
+    Escritura incremental de un índice (upsert/eliminación por id) sobre una
+    copia de preparación: el índice vigente sigue atendiendo consultas sin
+    cambios hasta que se publica.
+
+    Métodos:
+    - upsert(ids, textos, embeddings, metadatos)
+    - eliminar(ids)
+    - publicar(manifest): confirma lo escrito y lo hace vigente
+    - descartar(): abandona lo escrito sin tocar el índice vigente
+    """
+
+    def upsert(self, ids, textos, embeddings, metadatos):
+        raise NotImplementedError
+
+    def eliminar(self, ids):
+        raise NotImplementedError
+
+    def publicar(self, manifest):
+        raise NotImplementedError
+
+    def descartar(self):
+        pass
+
+
+class BackendChroma(BackendVectorial):
+    """
+    Chroma persistente (SQLite + HNSW) en 'Vector_DB - Documents'.
+
+    Cada construcción escribe una colección nueva ('becas_<id>') y el manifiesto
+    registra cuál es la vigente ("collection"). La colección anterior se
+    conserva al publicar, así los handles que otras sesiones o workers aún
+    tienen abiertos siguen respondiendo hasta que reabren la vigente; solo se
+    eliminan las de dos o más construcciones atrás.
+    """
+    nombre = "chroma"
+    PREFIJO_COLECCION = "becas_"
+
+    def __init__(self, persist_dir="Vector_DB - Documents"):
+        self.persist_dir = persist_dir
+        self.coleccion_construida = None
+
+    def _cliente(self):
+        return chromadb.PersistentClient(path=self.persist_dir, settings=_chroma_settings())
+
+    @classmethod
+    def nueva_coleccion(cls):
+        return cls.PREFIJO_COLECCION + uuid.uuid4().hex[:12]
+
+    def coleccion_vigente(self):
+        """Colección que apunta el manifiesto (los índices anteriores usan la de LangChain)."""
+        manifest = leer_manifest(self.persist_dir) or {}
+        return manifest.get("collection", Chroma._LANGCHAIN_DEFAULT_COLLECTION_NAME)
+
+    def cargar(self, embedding):
+        return Chroma(client=self._cliente(), collection_name=self.coleccion_vigente(),
+                      embedding_function=embedding)
+
+    def construir(self, chunks, embedding):
+        # Colección nueva: la vigente sigue atendiendo consultas hasta publicar
+        self.coleccion_construida = self.nueva_coleccion()
+        return Chroma.from_documents(documents=chunks, embedding=embedding, client=self._cliente(),
+                                     collection_name=self.coleccion_construida)
+
+    def publicar(self, manifest, coleccion=None):
+        anterior = self.coleccion_vigente()
+        # Sin construcción nueva (p. ej. la ingesta escribió en la vigente) se mantiene la actual
+        coleccion = coleccion or self.coleccion_construida or anterior
+        manifest["collection"] = coleccion
+        super().publicar(manifest)
+        self.retirar_colecciones(conservar={coleccion, anterior})
+
+    @staticmethod
+    def nombres_colecciones(client):
+        # chromadb < 0.6 devuelve objetos Collection; las versiones nuevas, nombres
+        return [getattr(coleccion, "name", coleccion) for coleccion in client.list_collections()]
+
+    def retirar_colecciones(self, conservar):
+        """Elimina las colecciones de construcciones anteriores que no están en `conservar`."""
+        client = self._cliente()
+        for nombre in self.nombres_colecciones(client):
+            if nombre not in conservar:
+                try:
+                    client.delete_collection(nombre)
+                except ValueError:
+                    pass
+
+    def abrir_escritura(self, desde_cero=False):
+        return EscritorChroma(self, desde_cero)
+
+
+class EscritorChroma(EscritorVectorial):
+    """
+    Escribe en una colección de preparación nueva (copia de la vigente, o vacía
+    con desde_cero). Al publicar, el manifiesto pasa a apuntarla; al descartar,
+    se elimina.
+    """
+    LOTE_COPIA = 1000
+
+    def __init__(self, backend, desde_cero=False):
+        self.backend = backend
+        self.client = backend._cliente()
+        self.nombre = backend.nueva_coleccion()
+        self.coleccion = self.client.create_collection(self.nombre)
+        self.publicado = False
+        if not desde_cero:
+            self._copiar(backend.coleccion_vigente())
+
+    def _copiar(self, nombre):
+        if nombre not in self.backend.nombres_colecciones(self.client):
+            return
+        origen = self.client.get_collection(nombre)
+        for inicio in range(0, origen.count(), self.LOTE_COPIA):
+            datos = origen.get(include=["embeddings", "documents", "metadatas"],
+                               limit=self.LOTE_COPIA, offset=inicio)
+            if datos["ids"]:
+                self.coleccion.upsert(ids=datos["ids"], embeddings=datos["embeddings"],
+                                      documents=datos["documents"], metadatas=datos["metadatas"])
+
+    def upsert(self, ids, textos, embeddings, metadatos):
+        self.coleccion.upsert(
+            ids=list(ids),
+            embeddings=[list(map(float, v)) for v in embeddings],
+            documents=list(textos),
+            metadatas=list(metadatos),
+        )
+
+    def eliminar(self, ids):
+        if ids:
+            self.coleccion.delete(ids=list(ids))
+
+    def publicar(self, manifest):
+        # Desde aquí la colección puede quedar vigente: descartar ya no debe borrarla
+        self.publicado = True
+        self.backend.publicar(manifest, coleccion=self.nombre)
+
+    def descartar(self):
+        if self.publicado:
+            return
+        try:
+            self.client.delete_collection(self.nombre)
+        except ValueError:
+            pass
+
+
+class BackendNumpy(BackendVectorial):
+    """
+    Matriz NumPy en memoria mapeada + tabla de metadatos en 'Vector_DB - Numpy'.
+
+    Cada construcción escribe sus archivos en un subdirectorio nuevo
+    ('v_<id>') y el manifiesto registra cuál es el vigente ("directory"), así
+    que el único cambio visible para los lectores es el reemplazo atómico del
+    manifiesto: nadie combina vectores nuevos con metadatos viejos, dos
+    construcciones simultáneas no comparten temporales y una caída a medias
+    deja el índice vigente intacto. Como en Chroma, se conserva el directorio
+    anterior (los procesos que lo tienen en mmap siguen respondiendo) y se
+    eliminan los de dos o más construcciones atrás. Los índices anteriores a
+    este esquema tienen los archivos en la raíz de persist_dir.
+    """
+    nombre = "numpy"
+    PREFIJO_DIRECTORIO = "v_"
+
+    def __init__(self, persist_dir="Vector_DB - Numpy", dtype=None, codificacion=None):
+        self.persist_dir = persist_dir
+        self.dtype = dtype or os.getenv("BECABOT_NUMPY_DTYPE", "float32")
+        # 'none', 'int8', 'pq' o 'pq<m>' (ver utils/quantizers.py)
+        codificacion = codificacion or os.getenv("BECABOT_NUMPY_ENCODING", "none")
+        self.codificacion = codificacion if codificacion != "none" else None
+        get_cuantizador(self.codificacion)  # valida el nombre antes de construir
+        self.directorio_construido = None
+
+    @classmethod
+    def nuevo_directorio(cls):
+        return cls.PREFIJO_DIRECTORIO + uuid.uuid4().hex[:12]
+
+    def directorio_vigente(self):
+        """Subdirectorio que apunta el manifiesto ('' para los índices con archivos en la raíz)."""
+        manifest = leer_manifest(self.persist_dir) or {}
+        return manifest.get("directory", "")
+
+    def ruta_vigente(self):
+        return os.path.join(self.persist_dir, self.directorio_vigente())
+
+    def existe(self):
+        return os.path.exists(os.path.join(self.ruta_vigente(), NumpyVectorStore.ARCHIVO_VECTORES))
+
+    def cargar(self, embedding):
+        return NumpyVectorStore(embedding, persist_dir=self.ruta_vigente())
+
+    def guardar_en_directorio_nuevo(self, store):
+        """Escribe el store en un subdirectorio propio (aún no vigente) y devuelve su nombre."""
+        directorio = self.nuevo_directorio()
+        store.persist_dir = os.path.join(self.persist_dir, directorio)
+        store._guardar()
+        return directorio
+
+    def construir(self, chunks, embedding):
+        # Reemplaza el índice completo en lugar de agregar sobre el existente
+        store = NumpyVectorStore(embedding, dtype=self.dtype, codificacion=self.codificacion)
+        store.add_documents(chunks)
+        self.directorio_construido = self.guardar_en_directorio_nuevo(store)
+        return store
+
+    def publicar(self, manifest, directorio=None):
+        anterior = self.directorio_vigente()
+        # Sin construcción nueva se mantiene el directorio actual
+        directorio = directorio or self.directorio_construido or anterior
+        manifest["directory"] = directorio
+        super().publicar(manifest)
+        self.retirar_directorios(conservar={directorio, anterior})
+
+    def retirar_directorios(self, conservar):
+        """Elimina los directorios (y archivos en la raíz) de construcciones que no están en `conservar`."""
+        for nombre in os.listdir(self.persist_dir):
+            ruta = os.path.join(self.persist_dir, nombre)
+            if nombre.startswith(self.PREFIJO_DIRECTORIO) and os.path.isdir(ruta) and nombre not in conservar:
+                shutil.rmtree(ruta, ignore_errors=True)
+        if "" not in conservar:
+            for archivo in (NumpyVectorStore.ARCHIVO_VECTORES, NumpyVectorStore.ARCHIVO_METADATOS,
+                            NumpyVectorStore.ARCHIVO_CONFIG, NumpyVectorStore.ARCHIVO_CODIGOS,
+                            NumpyVectorStore.ARCHIVO_CUANTIZADOR):
+                try:
+                    os.remove(os.path.join(self.persist_dir, archivo))
+                except FileNotFoundError:
+                    pass
+
+    def abrir_escritura(self, desde_cero=False):
+        return EscritorNumpy(self, desde_cero)
+
+
+class EscritorNumpy(EscritorVectorial):
+    """
+    Acumula los cambios en memoria (la copia de preparación) y al publicar los
+    escribe una sola vez en un subdirectorio nuevo (con codificación, el
+    cuantizador se reentrena en ese momento); después el manifiesto lo apunta.
+    Al descartar sin publicar no queda nada en disco.
+    """
+
+    def __init__(self, backend, desde_cero=False):
+        self.backend = backend
+        self.directorio = None
+        self.publicado = False
+        existente = NumpyVectorStore(None, persist_dir=backend.ruta_vigente()) if not desde_cero else None
+        if existente is not None and len(existente):
+            self.store = NumpyVectorStore(None, dtype=existente.dtype, codificacion=backend.codificacion)
+            self.store.agregar_embeddings(existente._textos, np.asarray(existente._matriz),
+                                          existente._metadatos, existente._ids)
+        else:
+            self.store = NumpyVectorStore(None, dtype=backend.dtype, codificacion=backend.codificacion)
+
+    def upsert(self, ids, textos, embeddings, metadatos):
+        self.store.agregar_embeddings(textos, embeddings, metadatos, ids)
+
+    def eliminar(self, ids):
+        self.store.delete(ids)
+
+    def publicar(self, manifest):
+        self.directorio = self.backend.guardar_en_directorio_nuevo(self.store)
+        # Desde aquí el directorio puede quedar vigente: descartar ya no debe borrarlo
+        self.publicado = True
+        self.backend.publicar(manifest, directorio=self.directorio)
+
+    def descartar(self):
+        self.store = None
+        if self.directorio and not self.publicado:
+            shutil.rmtree(os.path.join(self.backend.persist_dir, self.directorio), ignore_errors=True)
+
+
+BACKENDS = {
+    BackendChroma.nombre: BackendChroma,
+    BackendNumpy.nombre: BackendNumpy,
+}
+
+
+def get_backend(nombre=None):
+    """
+    Devuelve el backend vectorial solicitado ('chroma' o 'numpy').
+    Sin nombre, usa la variable de entorno BECABOT_VECTOR_BACKEND (por defecto 'chroma').
+    """
+    nombre = nombre or os.getenv("BECABOT_VECTOR_BACKEND", "chroma")
+    if nombre not in BACKENDS:
+        raise ValueError(f"Backend vectorial desconocido: {nombre}. Opciones: {', '.join(BACKENDS)}")
+    return BACKENDS[nombre]()
@@ -1,11 +1,12 @@
 import json
 import os
 import time
-from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
+# parsear_detalle_estructurado se reexporta por compatibilidad con código existente
+from utils.html_parsers import SECCIONES, get_parser, parsear_detalle_estructurado
 
 # ============================================================
 # 1. Configuración del Navegador
@@ -49,100 +50,84 @@ def procesar_metadatos(lista_clases):
     return tipos, modalidades
 
 # ============================================================
-# 3. Parseo Estructurado (La lógica V3 "Clave-Valor")
+# 3. Función Principal de Scraping (Orquestador)
 # ============================================================
-def parsear_detalle_estructurado(soup):
+def _guardar_html(html_dir, nombre, html):
+    """Guarda el HTML crudo de una página (fixtures para el benchmark de parseo)."""
+    os.makedirs(html_dir, exist_ok=True)
+    with open(os.path.join(html_dir, nombre), "w", encoding="utf-8") as f:
+        f.write(html)
+
+
+URL_BASE = "https://becas.utpl.edu.ec/"
+
+
+def obtener_listado(driver, parser_html, html_dir=None):
     """
-    Extrae la información en formato diccionario buscando pares Label-Valor
-    típicos de Drupal/UTPL.
+    Descarga la página principal y devuelve la lista de becas (sin contenido).
+    Cada beca: {"titulo", "url", "nivel", "tipos", "modalidades", "contenido": {}}.
     """
-    detalles = {}
+    driver.get(URL_BASE)
+    time.sleep(5) # Espera a que cargue el JS inicial
     
-    # Buscamos el contenedor principal
-    region = soup.find('div', class_='region-content') or soup.find('div', class_='content')
-    if not region:
-        return {"Nota": "No se detectó el contenedor principal de contenido."}
-
-    # Estrategia A: Buscar estructura de campos 'field'
-    campos = region.find_all('div', class_=lambda x: x and 'field' in x.split())
+    html_listado = driver.page_source
+    if html_dir:
+        _guardar_html(html_dir, "listado.html", html_listado)
     
-    found_structure = False
-    for campo in campos:
-        etiqueta_div = campo.find('div', class_='field-label')
-        items_div = campo.find('div', class_='field-items')
+    lista_becas = []
+    listado = parser_html.parsear_listado(html_listado, SECCIONES)
+    
+    for clase_sec, nombre_nivel in SECCIONES.items():
+        if clase_sec not in listado: continue
         
-        if etiqueta_div and items_div:
-            key = etiqueta_div.get_text(strip=True).rstrip(':')
-            # Mantenemos saltos de línea para listas dentro de los valores
-            value = items_div.get_text(separator='\n', strip=True)
-            detalles[key] = value
-            found_structure = True
-
-    # Estrategia B: Tablas HTML
-    if not found_structure:
-        filas = region.find_all('tr')
-        for fila in filas:
-            cols = fila.find_all(['td', 'th'])
-            if len(cols) >= 2:
-                key = cols[0].get_text(strip=True).rstrip(':')
-                val = cols[1].get_text(separator='\n', strip=True)
-                detalles[key] = val
-                found_structure = True
-
-    # Estrategia C: Fallback a texto plano si falla la estructura
-    if not found_structure:
-        return {"Información General": region.get_text(separator='\n', strip=True)}
+        items = listado[clase_sec]
+        print(f"   -> Procesando sección {nombre_nivel}: {len(items)} becas encontradas.")
         
-    return detalles
+        for item in items:
+            url_relativa = item["href"]
+            url_completa = URL_BASE + url_relativa if url_relativa and not url_relativa.startswith('http') else url_relativa
+            
+            # Extraer metadatos de las clases CSS
+            tipos, mods = procesar_metadatos(item["clases"])
+            
+            lista_becas.append({
+                "titulo": item["titulo"],
+                "url": url_completa,
+                "nivel": nombre_nivel,
+                "tipos": tipos,
+                "modalidades": mods,
+                "contenido": {} # Placeholder
+            })
+    return lista_becas
 
-# ============================================================
-# 4. Función Principal de Scraping (Orquestador)
-# ============================================================
-def scrape_utpl_becas(save_path="knowledge_base/corpus_utpl.json"):
+
+def descargar_pagina(driver, url, espera=1.5):
+    """Descarga una página de detalle y devuelve su HTML."""
+    driver.get(url)
+    time.sleep(espera) # Pausa ética y técnica
+    return driver.page_source
+
+
+def scrape_utpl_becas(save_path="knowledge_base/corpus_utpl.json", parser=None, html_dir=None):
     """
     Función principal para llamar desde tu app.py.
     Realiza el scraping completo y guarda el JSON.
+
+    Parámetros:
+    - parser: nombre del backend de parseo ('lxml' o 'bs4'); por defecto el más rápido disponible.
+    - html_dir: si se indica, guarda ahí el HTML de cada página descargada.
     """
-    url_base = "https://becas.utpl.edu.ec/"
-    print(f"Iniciando scraping avanzado en {url_base}...")
+    print(f"Iniciando scraping avanzado en {URL_BASE}...")
     
     driver = None
     lista_becas = []
+    parser_html = get_parser(parser)
 
     try:
         driver = configurar_driver()
-        driver.get(url_base)
-        time.sleep(5) # Espera a que cargue el JS inicial
-        
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
         
         # --- PASO 1: OBTENER LISTA DE ENLACES ---
-        secciones = {'grado': 'Grado', 'posgrado': 'Posgrado', 'tecnologia': 'Tecnologías'}
-        
-        for clase_sec, nombre_nivel in secciones.items():
-            contenedor = soup.find('div', class_=clase_sec)
-            if not contenedor: continue
-            
-            items = contenedor.find_all('div', class_='item')
-            print(f"   -> Procesando sección {nombre_nivel}: {len(items)} becas encontradas.")
-            
-            for item in items:
-                enlace = item.find('a')
-                if enlace:
-                    url_relativa = enlace.get('href')
-                    url_completa = url_base + url_relativa if url_relativa and not url_relativa.startswith('http') else url_relativa
-                    
-                    # Extraer metadatos de las clases CSS
-                    tipos, mods = procesar_metadatos(item.get('class', []))
-                    
-                    lista_becas.append({
-                        "titulo": enlace.get_text(strip=True),
-                        "url": url_completa,
-                        "nivel": nombre_nivel,
-                        "tipos": tipos,
-                        "modalidades": mods,
-                        "contenido": {} # Placeholder
-                    })
+        lista_becas = obtener_listado(driver, parser_html, html_dir)
         
         # --- PASO 2: ENRIQUECER CON DETALLE (LINK POR LINK) ---
         total = len(lista_becas)
@@ -151,12 +136,12 @@ def scrape_utpl_becas(save_path="knowledge_base/corpus_utpl.json"):
         for i, beca in enumerate(lista_becas):
             print(f"   [{i+1}/{total}] {beca['titulo']}")
             try:
-                driver.get(beca['url'])
-                time.sleep(1.5) # Pausa ética y técnica
-                soup_detalle = BeautifulSoup(driver.page_source, 'html.parser')
+                html_detalle = descargar_pagina(driver, beca['url'])
+                if html_dir:
+                    _guardar_html(html_dir, f"detalle_{i:03d}.html", html_detalle)
                 
-                # Usamos la función de parseo estructurado
-                beca['contenido'] = parsear_detalle_estructurado(soup_detalle)
+                # Usamos el parseo estructurado del backend seleccionado
+                beca['contenido'] = parser_html.parsear_detalle(html_detalle)
                 
             except Exception as e:
                 print(f"   ⚠️ Error en {beca['url']}: {e}")